@@ -0,0 +1,194 @@
+"""Local stand-ins for the Telegram Bot API and the OpenAI chat completions endpoint.
+
+Run standalone to poke at them by hand:
+
+    python bench/fakes.py --telegram-port 8081 --openai-port 8082
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from http_server import start_http_server  # noqa: E402
+
+TRUE_METHODS = {
+    "deleteMessage", "setMyCommands", "setChatMenuButton", "answerCallbackQuery", "deleteWebhook", "setWebhook",
+    "sendChatAction", "deleteMyCommands",
+}
+
+
+def parse_params(headers: dict, body: bytes) -> dict:
+    content_type = headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        message = BytesParser(policy=default_policy).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+        )
+        params = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if part.get_filename() is None:
+                params[name] = part.get_content()
+            else:
+                params[name] = part.get_filename()
+        return params
+    if content_type.startswith("application/json"):
+        return json.loads(body or b"{}")
+    return {key: values[0] for key, values in parse_qs(body.decode("utf-8")).items()}
+
+
+class FakeTelegram:
+    """Answers Bot API calls with plausible results and counts them per method."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self._message_ids = itertools.count(1000)
+
+    def _message(self, params: dict, **extra) -> dict:
+        message = {
+            "message_id": int(params.get("message_id") or next(self._message_ids)),
+            "date": int(time.time()),
+            "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+        }
+        if "text" in params:
+            message["text"] = params["text"]
+        message.update(extra)
+        return message
+
+    async def handle(self, method: str, path: str, headers: dict, body: bytes):
+        parts = path.split("?")[0].strip("/").split("/")
+        if len(parts) < 2:
+            return 404, "application/json", b'{"ok":false}'
+        api_method = parts[-1]
+        if api_method == "stats":
+            return 200, "application/json", json.dumps(self.calls).encode("utf-8")
+        params = parse_params(headers, body)
+        self.calls[api_method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if api_method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        elif api_method in ("sendMessage", "editMessageText"):
+            result = self._message(params)
+        elif api_method == "sendPhoto":
+            photo_id = f"photo-{abs(hash(params.get('photo'))) % 1000}"
+            result = self._message(params, photo=[
+                {"file_id": photo_id, "file_unique_id": photo_id, "width": 640, "height": 480}
+            ])
+        elif api_method == "getMyCommands":
+            result = []
+        elif api_method == "getUpdates":
+            await asyncio.sleep(1)
+            result = []
+        elif api_method in TRUE_METHODS:
+            result = True
+        else:
+            return 400, "application/json", json.dumps(
+                {"ok": False, "error_code": 400, "description": f"Bad Request: {api_method} is not faked"}
+            ).encode("utf-8")
+        return 200, "application/json", json.dumps({"ok": True, "result": result}).encode("utf-8")
+
+
+class FakeOpenAI:
+    """Chat completions with configurable latency, streaming and an error rate."""
+
+    def __init__(self, latency: float = 0.5, token_delay: float = 0.01, tokens: int = 60, error_rate: float = 0.0):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self._facts = itertools.count(1)
+        self._recommendations = itertools.count(1)
+
+    def _answer(self, messages: list) -> str:
+        user_text = messages[-1]["content"] if messages else ""
+        system_text = messages[0]["content"] if messages else ""
+        if "фактів" in user_text:
+            return "\n".join(f"{index}. Факт номер {next(self._facts)} про щось цікаве." for index in range(1, 6))
+        if "рекомендац" in system_text.lower():
+            # JSON-mode batch like the real model returns, with titles that never repeat so none is deduplicated
+            batch_size = re.search(r"(\d+) різних", system_text)
+            return json.dumps({"items": [
+                {"title": f"Тестова назва {next(self._recommendations)}",
+                 "description": "Короткий опис, чому це варто спробувати."}
+                for _ in range(int(batch_size.group(1)) if batch_size else 5)
+            ]}, ensure_ascii=False)
+        return " ".join(f"слово{index}" for index in range(self.tokens))
+
+    async def _stream(self, model: str, answer: str):
+        await asyncio.sleep(self.latency)
+        for word in answer.split(" "):
+            chunk = {
+                "id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8")
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+        yield b"data: [DONE]\n\n"
+
+    async def handle(self, method: str, path: str, headers: dict, body: bytes):
+        if path.split("?")[0].rstrip("/").endswith("/stats"):
+            return 200, "application/json", json.dumps(self.calls).encode("utf-8")
+        if not path.split("?")[0].rstrip("/").endswith("/chat/completions"):
+            return 404, "application/json", b'{"error":{"message":"not found"}}'
+        request = json.loads(body)
+        self.calls["stream" if request.get("stream") else "completion"] += 1
+        if self.error_rate and random.random() < self.error_rate:
+            self.calls["errors"] += 1
+            status = random.choice((429, 500, 503))
+            return status, "application/json", json.dumps(
+                {"error": {"message": "fake failure", "type": "server_error", "code": status}}
+            ).encode("utf-8")
+        answer = self._answer(request.get("messages", []))
+        if request.get("stream"):
+            return 200, "text/event-stream", self._stream(request.get("model", ""), answer)
+        await asyncio.sleep(self.latency + self.token_delay * len(answer.split(" ")))
+        completion = {
+            "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()),
+            "model": request.get("model", ""),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": len(answer.split(" ")), "total_tokens": 0},
+        }
+        return 200, "application/json", json.dumps(completion, ensure_ascii=False).encode("utf-8")
+
+
+async def serve(telegram_port: int, openai_port: int, telegram_latency: float, openai_latency: float,
+                token_delay: float, error_rate: float, ready=None) -> None:
+    telegram = FakeTelegram(latency=telegram_latency)
+    openai = FakeOpenAI(latency=openai_latency, token_delay=token_delay, error_rate=error_rate)
+    await start_http_server(telegram.handle, "127.0.0.1", telegram_port)
+    await start_http_server(openai.handle, "127.0.0.1", openai_port)
+    if ready is not None:
+        ready.set()
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--telegram-port", type=int, default=8081)
+    parser.add_argument("--openai-port", type=int, default=8082)
+    parser.add_argument("--telegram-latency", type=float, default=0.02)
+    parser.add_argument("--openai-latency", type=float, default=0.5)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(serve(args.telegram_port, args.openai_port, args.telegram_latency, args.openai_latency,
+                      args.token_delay, args.error_rate))
+
+
+if __name__ == "__main__":
+    main()
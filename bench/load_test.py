@@ -0,0 +1,197 @@
+"""Replays scripted user sessions against the real handlers with fake Telegram and OpenAI servers.
+
+    python bench/load_test.py --users 200 --concurrency 50
+
+Reports handler latency percentiles, updates per second, API calls per update and peak RSS.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import time
+
+import httpx
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+BOT_TOKEN = "123456:bench"
+
+SESSIONS = {
+    "start": [("command", "/start")],
+    "random": [("command", "/random"), ("callback", "random")],
+    "gpt": [("command", "/gpt"), ("text", "Що таке Python?"), ("text", "А чому він так називається?"),
+            ("text", "Дякую!")],
+    "talk": [("command", "/talk"), ("callback", "talk_linus_torvalds"), ("text", "Як з'явився Linux?"),
+             ("text", "Що ви думаєте про Rust?")],
+    "translate": [("command", "/translate"), ("callback", "lang_en"), ("text", "Привіт, як справи?"),
+                  ("callback", "change_de"), ("text", "Привіт, як справи?")],
+    "recommend": [("command", "/recommend"), ("callback", "rec_movies"), ("text", "комедія"),
+                  ("callback", "rec_dislike"), ("callback", "rec_dislike")],
+}
+
+update_ids = itertools.count(1)
+message_ids = itertools.count(1)
+
+
+def make_update(user_id: int, kind: str, value: str) -> dict:
+    user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+    chat = {"id": user_id, "type": "private"}
+    if kind == "callback":
+        return {
+            "update_id": next(update_ids),
+            "callback_query": {
+                "id": str(next(update_ids)),
+                "from": user,
+                "chat_instance": str(user_id),
+                "data": value,
+                "message": {"message_id": next(message_ids), "date": int(time.time()), "chat": chat, "text": "..."},
+            },
+        }
+    message = {"message_id": next(message_ids), "date": int(time.time()), "chat": chat, "from": user, "text": value}
+    if kind == "command":
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(value.split()[0])}]
+    return {"update_id": next(update_ids), "message": message}
+
+
+def run_fakes(args, ready) -> None:
+    from fakes import serve
+
+    asyncio.run(serve(args.telegram_port, args.openai_port, args.telegram_latency, args.openai_latency,
+                      args.token_delay, args.error_rate, ready))
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+async def fetch_stats(url: str) -> dict:
+    async with httpx.AsyncClient() as client:
+        return (await client.get(url)).json()
+
+
+async def run_benchmark(args) -> dict:
+    os.environ.update({
+        "BOT_TOKEN": BOT_TOKEN,
+        "CHATGPT_TOKEN": "sk-bench",
+        "TELEGRAM_BASE_URL": f"http://127.0.0.1:{args.telegram_port}",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.openai_port}/v1",
+        "OPENAI_PROXY": "",
+        "PERSISTENCE_PATH": "",
+        "FILE_ID_CACHE_PATH": "",
+        "RESPONSE_CACHE_PATH": "",
+        "METRICS_PORT": "0",
+    })
+    if not args.real_limits:
+        # The fake backend has no quota; with the default TPM the governor charges max_tokens per call
+        # and the report would measure its sleeps instead of the handlers
+        os.environ.update({"OPENAI_RPM": "1000000", "OPENAI_TPM": "1000000000"})
+    from telegram import Update
+    import bot
+    from config import Config
+
+    app = bot.build_application(Config.from_env(dotenv=False))
+    await app.initialize()
+    await bot.post_init(app)
+
+    latencies = {}
+    errors = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+    session_names = args.sessions.split(",")
+
+    async def run_session(user_id: int, name: str) -> None:
+        async with semaphore:
+            for kind, value in SESSIONS[name]:
+                update = Update.de_json(make_update(user_id, kind, value), app.bot)
+                started = time.perf_counter()
+                try:
+                    await app.process_update(update)
+                except Exception as e:
+                    errors.append(f"{name}: {e}")
+                latencies.setdefault(name, []).append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_session(100000 + user, session_names[user % len(session_names)])
+        for user in range(args.users)
+    ))
+    elapsed = time.perf_counter() - started
+
+    telegram_calls = await fetch_stats(f"http://127.0.0.1:{args.telegram_port}/bot{BOT_TOKEN}/stats")
+    openai_calls = await fetch_stats(f"http://127.0.0.1:{args.openai_port}/v1/stats")
+    await app.shutdown()
+    await bot.post_shutdown(app)
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    updates = len(all_latencies)
+    telegram_total = sum(count for method, count in telegram_calls.items() if method != "getMe")
+    openai_total = openai_calls.get("stream", 0) + openai_calls.get("completion", 0)
+    return {
+        "updates": updates,
+        "elapsed_s": round(elapsed, 3),
+        "updates_per_s": round(updates / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            name: {
+                "p50": round(percentile(values, 0.50) * 1000, 1),
+                "p95": round(percentile(values, 0.95) * 1000, 1),
+                "p99": round(percentile(values, 0.99) * 1000, 1),
+                "mean": round(statistics.fmean(values) * 1000, 1),
+            }
+            for name, values in sorted(latencies.items()) + [("all", all_latencies)]
+        },
+        "telegram_calls_per_update": round(telegram_total / updates, 2) if updates else 0.0,
+        "openai_calls_per_update": round(openai_total / updates, 2) if updates else 0.0,
+        "telegram_calls": telegram_calls,
+        "openai_calls": openai_calls,
+        "errors": len(errors),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--sessions", default=",".join(SESSIONS), help="comma-separated session scripts to replay")
+    parser.add_argument("--telegram-port", type=int, default=18081)
+    parser.add_argument("--openai-port", type=int, default=18082)
+    parser.add_argument("--telegram-latency", type=float, default=0.02)
+    parser.add_argument("--openai-latency", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--real-limits", action="store_true",
+                        help="keep the configured OPENAI_RPM/OPENAI_TPM instead of lifting them for the fake backend")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    ready = multiprocessing.Event()
+    fakes = multiprocessing.Process(target=run_fakes, args=(args, ready), daemon=True)
+    fakes.start()
+    if not ready.wait(10):
+        sys.exit("Fake servers did not start")
+    try:
+        report = asyncio.run(run_benchmark(args))
+    finally:
+        fakes.terminate()
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    print(f"updates: {report['updates']} in {report['elapsed_s']} s ({report['updates_per_s']} updates/s), "
+          f"errors: {report['errors']}")
+    print(f"{'session':<12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for name, values in report["latency_ms"].items():
+        print(f"{name:<12}{values['p50']:>10}{values['p95']:>10}{values['p99']:>10}{values['mean']:>10}")
+    print(f"Telegram calls/update: {report['telegram_calls_per_update']}  "
+          f"OpenAI calls/update: {report['openai_calls_per_update']}  peak RSS: {report['peak_rss_mb']} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,172 @@
+import asyncio
+import logging
+import sys
+import time
+
+# Taken before the third-party and project imports below so the startup profile can time them
+IMPORTS_STARTED = time.perf_counter()
+
 from telegram import Update
-from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandler, MessageHandler, filters
+from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandler, MessageHandler, TypeHandler, filters
 
-from config import BOT_TOKEN
-from handlers import (start, random, random_button, gpt, message_handler, talk, talk_button, translate, translate_language_selected, translate_change_language, recommend, recommend_category_selected, recommend_dislike
+import handlers
+import metrics
+from config import Config
+from handlers import (start, random, random_button, gpt, message_handler, talk, talk_button, translate, translate_language_selected, translate_change_language, translate_all, recommend, recommend_category_selected, recommend_dislike,
+                      main_menu, REQUIRED_RESOURCES
 )
+from http_server import start_http_server
+from metrics import StartupProfile, track_handler
+from persistence import SQLitePersistence
+from rate_limit import OutboundRateLimiter
+from update_processor import PerChatUpdateProcessor
+from utils import resources
+
+logger = logging.getLogger(__name__)
+
+
+def allowed_updates_for(application) -> list:
+    """Subscribe only to the update types the registered handlers can actually process."""
+    update_types = set()
+    for group in application.handlers.values():
+        for handler in group:
+            if isinstance(handler, CallbackQueryHandler):
+                update_types.add(Update.CALLBACK_QUERY)
+            elif isinstance(handler, (CommandHandler, MessageHandler)):
+                update_types.add(Update.MESSAGE)
+    return sorted(update_types)
+
+
+async def post_init(application):
+    config = application.bot_data["config"]
+    chatgpt_service = handlers.chatgpt_service
+    await main_menu.install(application.bot)
+    handlers.fact_pool.start()
+    metrics.tracing_enabled = config.trace_updates
+    metrics.OPENAI_QUEUE_DEPTH.set_function(lambda: chatgpt_service.governor.queue_depth)
+    metrics.OPENAI_IN_FLIGHT.set_function(lambda: chatgpt_service.governor.in_flight)
+    if chatgpt_service.cache is not None:
+        metrics.CACHE_HITS.set_function(lambda: chatgpt_service.cache.hits)
+        metrics.CACHE_MISSES.set_function(lambda: chatgpt_service.cache.misses)
+    metrics.FACT_POOL_SIZE.set_function(lambda: len(handlers.fact_pool))
+    # Plain asyncio tasks: the application is not running yet, and these are cancelled in post_shutdown
+    background_tasks = application.bot_data["background_tasks"] = [asyncio.create_task(metrics.monitor_event_loop())]
+    if config.metrics_port:
+        application.bot_data["metrics_server"] = await start_http_server(
+            metrics.handle_http, config.metrics_host, config.metrics_port
+        )
+    if config.resources_hot_reload:
+        background_tasks.append(asyncio.create_task(resources.watch(config.resources_reload_interval)))
+    profile = application.bot_data.get("startup_profile")
+    if profile is not None:
+        profile.mark("post_init")
+        logger.info(profile.report())
+
+
+async def post_shutdown(application):
+    background_tasks = application.bot_data.get("background_tasks", [])
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    metrics_server = application.bot_data.get("metrics_server")
+    if metrics_server is not None:
+        metrics_server.close()
+        await metrics_server.wait_closed()
+    await handlers.chatgpt_service.close()
+
+
+def build_application(config: Config):
+    """Application factory: everything the bot needs is built from ``config`` here, nothing at import time."""
+    handlers.setup(config)
+    builder = ApplicationBuilder().token(config.bot_token)
+    if config.telegram_base_url:
+        builder = (
+            builder
+            .base_url(f"{config.telegram_base_url}/bot")
+            .base_file_url(f"{config.telegram_base_url}/file/bot")
+        )
+    persistence = None
+    if config.persistence_path:
+        persistence = SQLitePersistence(config.persistence_path, update_interval=config.persistence_interval)
+        builder = builder.persistence(persistence)
+    app = (
+        builder
+        .concurrent_updates(PerChatUpdateProcessor())
+        .rate_limiter(OutboundRateLimiter(
+            overall_rate=config.telegram_global_rate,
+            chat_rate=config.telegram_chat_rate,
+            chat_burst=config.telegram_chat_burst,
+            group_rate=config.telegram_group_rate / 60,
+            max_retries=config.telegram_max_retries
+        ))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+    app.bot_data["config"] = config
+    register_handlers(app, persistence)
+    return app
+
+
+def register_handlers(app, persistence=None):
+    if persistence is not None:
+        app.add_handler(TypeHandler(Update, persistence.load_session), group=-1)
+    app.add_handler(CommandHandler("start", track_handler(start)))
+    app.add_handler(CommandHandler("random", track_handler(random)))
+    app.add_handler(CommandHandler("gpt", track_handler(gpt)))
+    app.add_handler(CommandHandler("talk", track_handler(talk)))
+    app.add_handler(CommandHandler("translate", track_handler(translate)))
+    app.add_handler(CommandHandler("recommend", track_handler(recommend)))
+
+    app.add_handler(CallbackQueryHandler(track_handler(random_button), pattern='^(random|start)$'))
+    app.add_handler(
+        CallbackQueryHandler(track_handler(talk_button), pattern='^(talk_linus_torvalds|talk_guido_van_rossum|talk_mark_zuckerberg)$'))
+    app.add_handler(CallbackQueryHandler(track_handler(translate_language_selected), pattern="^lang_"))
+    app.add_handler(CallbackQueryHandler(track_handler(translate_change_language), pattern="^(change_|finish_translate)"))
+    app.add_handler(CallbackQueryHandler(track_handler(translate_all), pattern="^translate_all$"))
+    app.add_handler(CallbackQueryHandler(track_handler(recommend_category_selected), pattern="^rec_(movies|books|music)$"))
+    app.add_handler(CallbackQueryHandler(track_handler(recommend_dislike), pattern="^rec_dislike$"))
+
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, track_handler(message_handler, by_state=True)))
+
 
-app = ApplicationBuilder().token(BOT_TOKEN).build()
-app.add_handler(CommandHandler("start", start))
-app.add_handler(CommandHandler("random", random))
-app.add_handler(CommandHandler("gpt", gpt))
-app.add_handler(CommandHandler("talk", talk))
-app.add_handler(CommandHandler("translate", translate))
-app.add_handler(CommandHandler("recommend", recommend))
+def run(app):
+    config = app.bot_data["config"]
+    if config.bot_mode == "webhook":
+        # Every worker behind the load balancer registers the same public URL and secret, so this is idempotent
+        app.run_webhook(
+            listen=config.webhook_listen,
+            port=config.webhook_port,
+            url_path=config.webhook_path,
+            webhook_url=config.webhook_url,
+            secret_token=config.webhook_secret,
+            drop_pending_updates=config.drop_pending_updates,
+            allowed_updates=allowed_updates_for(app)
+        )
+    else:
+        app.run_polling(drop_pending_updates=config.drop_pending_updates, allowed_updates=allowed_updates_for(app))
 
-app.add_handler(CallbackQueryHandler(random_button, pattern='^(random|start)$'))
-app.add_handler(
-    CallbackQueryHandler(talk_button, pattern='^(talk_linus_torvalds|talk_guido_van_rossum|talk_mark_zuckerberg)$'))
-app.add_handler(CallbackQueryHandler(translate_language_selected, pattern="^lang_"))
-app.add_handler(CallbackQueryHandler(translate_change_language, pattern="^(change_|finish_translate)"))
-app.add_handler(CallbackQueryHandler(recommend_category_selected, pattern="^rec_(movies|books|music)$"))
-app.add_handler(CallbackQueryHandler(recommend_dislike, pattern="^rec_dislike$"))
 
-app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, message_handler))
+def main(argv: list) -> None:
+    profile = StartupProfile(imports=time.perf_counter() - IMPORTS_STARTED)
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    config = Config.from_env()
+    profile.mark("config")
+    resources.load()
+    for kind, names in REQUIRED_RESOURCES.items():
+        resources.require(kind, names)
+    profile.mark("resources")
+    app = build_application(config)
+    profile.mark("build")
+    if "--profile-startup" in argv:
+        print(profile.report())
+        return
+    app.bot_data["startup_profile"] = profile
+    run(app)
 
 
-app.run_polling(drop_pending_updates=True, allowed_updates=Update.ALL_TYPES)
+if __name__ == "__main__":
+    main(sys.argv[1:])
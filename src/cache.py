@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+class ResponseCache:
+    """Two-tier cache for completions: an in-memory LRU in front of an optional SQLite file.
+
+    Entries carry their own expiry, so every call site picks its TTL when it stores a value.
+    The disk tier is only touched off the event loop: lookups that miss memory read it in
+    a thread, and writes are queued and stored in one transaction by a background task,
+    which also deletes expired rows every ``sweep_interval`` seconds.
+    """
+
+    def __init__(self, max_entries: int = 1000, disk_path: str = None, sweep_interval: float = 3600):
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self.sweep_interval = sweep_interval
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: OrderedDict = OrderedDict()
+        self._db = None
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._flush_task = None
+        self._swept_at = 0.0
+
+    @staticmethod
+    def make_key(prompt_text: str, message_text: str, model: str, **params) -> str:
+        payload = json.dumps(
+            [normalize_text(prompt_text), normalize_text(message_text), model, params],
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _connection(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.disk_path, check_same_thread=False)
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL);"
+                "CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at);"
+            )
+        return self._db
+
+    def _read(self, key: str):
+        with self._lock:
+            return self._connection().execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+    def _write(self, pending: dict, sweep: bool) -> None:
+        with self._lock:
+            db = self._connection()
+            with db:
+                db.executemany(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                    ((key, value, expires_at) for key, (expires_at, value) in pending.items())
+                )
+                if sweep:
+                    db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, key: str):
+        now = time.time()
+        entry = self._memory.get(key) or self._pending.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._remember(key, entry[1], entry[0])
+                self.hits += 1
+                return entry[1]
+            self._memory.pop(key, None)
+        if self.disk_path:
+            try:
+                row = await asyncio.to_thread(self._read, key)
+            except sqlite3.Error as e:
+                logger.error(f"Помилка читання кешу відповідей з {self.disk_path}: {e}")
+                row = None
+            if row is not None and row[1] > time.time():
+                self._remember(key, row[0], row[1])
+                self.hits += 1
+                self.disk_hits += 1
+                return row[0]
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        expires_at = time.time() + ttl
+        self._remember(key, value, expires_at)
+        if self.disk_path:
+            self._pending[key] = (expires_at, value)
+            if self._flush_task is None or self._flush_task.done():
+                self._flush_task = asyncio.get_running_loop().create_task(self._flush_pending())
+
+    async def _flush_pending(self) -> None:
+        while self._pending:
+            pending, self._pending = self._pending, {}
+            sweep = time.monotonic() - self._swept_at >= self.sweep_interval
+            try:
+                await asyncio.to_thread(self._write, pending, sweep)
+            except sqlite3.Error as e:
+                logger.error(f"Помилка запису кешу відповідей у {self.disk_path}: {e}")
+                continue
+            if sweep:
+                self._swept_at = time.monotonic()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._memory),
+        }
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            await self._flush_task
+        await self._flush_pending()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -1,11 +1,116 @@
 import os
-from dotenv import load_dotenv
+from dataclasses import dataclass, fields
+from typing import Optional
 
-load_dotenv()
 
+def _flag(value: str) -> bool:
+    return value.lower() in ("1", "true", "yes")
 
-CHATGPT_TOKEN = os.getenv("CHATGPT_TOKEN")
-BOT_TOKEN = os.getenv("BOT_TOKEN")
+
+def _optional(value: str) -> Optional[str]:
+    return value or None
+
+
+_PARSERS = {str: str, int: int, float: float, bool: _flag, Optional[str]: _optional}
+
+
+@dataclass(frozen=True)
+class Config:
+    """Every setting of the bot. Field ``foo_bar`` is read from the ``FOO_BAR`` environment variable.
+
+    Importing this module has no side effects; nothing reads the environment or
+    .env until from_env() is called.
+    """
+
+    chatgpt_token: Optional[str] = None
+    bot_token: Optional[str] = None
+    # Points the bot at a local Bot API server or a stand-in for testing, e.g. http://localhost:8081
+    telegram_base_url: str = ""
+
+    # "polling" or "webhook"
+    bot_mode: str = "polling"
+    webhook_url: Optional[str] = None
+    webhook_listen: str = "0.0.0.0"
+    webhook_port: int = 8443
+    webhook_path: str = "telegram"
+    webhook_secret: Optional[str] = None
+    drop_pending_updates: bool = True
+
+    # Sharded mode (src/supervisor.py): the supervisor listens on webhook_port, workers on shard_base_port + i
+    shard_workers: int = 4
+    shard_base_port: int = 9000
+    shard_health_interval: float = 5
+
+    # Bot API flood limits: messages per second overall and per private chat, messages per minute per group
+    telegram_global_rate: float = 30
+    telegram_chat_rate: float = 1
+    telegram_chat_burst: float = 3
+    telegram_group_rate: float = 20
+    telegram_max_retries: int = 3
+
+    # Alternative OpenAI-compatible endpoint, e.g. the fake server used by bench/load_test.py
+    openai_base_url: Optional[str] = None
+    openai_proxy: Optional[str] = None
+    openai_max_connections: int = 100
+    openai_max_keepalive_connections: int = 20
+    openai_connect_timeout: float = 10
+    openai_request_timeout: float = 60
+    openai_model: str = "gpt-3.5-turbo"
+    openai_max_tokens: int = 3000
+    openai_max_in_flight: int = 20
+    openai_max_queue: int = 200
+    openai_rpm: float = 3500
+    openai_tpm: float = 90000
+    openai_max_retries: int = 3
+
+    conversation_max_sessions: int = 10000
+    conversation_ttl: float = 3600
+    conversation_max_chars: int = 50_000_000
+    history_token_budget: int = 3000
+
+    response_cache_size: int = 5000
+    response_cache_path: str = ""
+    translation_cache_ttl: float = 86400
+
+    fact_pool_size: int = 20
+    fact_pool_low_water: int = 5
+    fact_batch_size: int = 5
+    recommendation_batch_size: int = 5
+    recommendation_low_water: int = 2
+    recommendation_max_excluded: int = 30
+
+    # Prometheus-style /metrics endpoint; 0 disables it
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 9100
+    # Log a per-update breakdown of handler, OpenAI and Bot API time
+    trace_updates: bool = False
+
+    # Telegram allows roughly one message edit per second per chat
+    stream_edit_interval: float = 1.0
+
+    # SQLite file for user_data/chat_data; empty disables persistence
+    persistence_path: str = "bot_state.db"
+    persistence_interval: float = 5
+
+    file_id_cache_path: str = "file_id_cache.json"
+
+    resources_hot_reload: bool = False
+    resources_reload_interval: float = 2
+
+    @classmethod
+    def from_env(cls, environ=None, dotenv: bool = True) -> "Config":
+        """Build a Config from ``environ`` (os.environ by default), after loading .env when ``dotenv`` is set."""
+        if dotenv:
+            from dotenv import load_dotenv
+            load_dotenv()
+        if environ is None:
+            environ = os.environ
+        values = {}
+        for field in fields(cls):
+            raw = environ.get(field.name.upper())
+            if raw is not None:
+                values[field.name] = _PARSERS[field.type](raw)
+        return cls(**values)
 
 
 LANGUAGES = {
@@ -17,6 +122,3 @@ LANGUAGES = {
     "pl": "🇵🇱 Польська",
     "it": "🇮🇹 Італійська",
 }
-
-print(CHATGPT_TOKEN)
-print(BOT_TOKEN)
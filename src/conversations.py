@@ -0,0 +1,115 @@
+import time
+from collections import OrderedDict, deque
+
+from prompts import system_message, system_tokens
+from tokens import count_message_tokens
+
+
+class Conversation:
+    __slots__ = ("system_message", "system_tokens", "messages", "tokens", "size", "last_used")
+
+    def __init__(self, system_prompt: str = None):
+        # Shared with every other chat using the same persona, so the prefix is byte-identical
+        self.system_message = system_message(system_prompt) if system_prompt else None
+        self.system_tokens = system_tokens(system_prompt) if system_prompt else 0
+        # (role, content, tokens) tuples are much smaller than dicts or ChatCompletionMessage objects,
+        # and keeping the token count per message lets trimming avoid re-tokenizing the history
+        self.messages = deque()
+        self.tokens = self.system_tokens
+        self.size = len(system_prompt) if system_prompt else 0
+        self.last_used = time.monotonic()
+
+    def append(self, role: str, content: str) -> int:
+        tokens = count_message_tokens(content)
+        self.messages.append((role, content, tokens))
+        self.tokens += tokens
+        self.size += len(content)
+        return len(content)
+
+    def trim(self, token_budget: int) -> int:
+        """Drop the oldest turns until the history fits the budget, always keeping the latest message."""
+        freed = 0
+        while self.tokens > token_budget and len(self.messages) > 1:
+            _, content, tokens = self.messages.popleft()
+            self.tokens -= tokens
+            self.size -= len(content)
+            freed += len(content)
+        return freed
+
+    def prompt_tokens(self) -> tuple:
+        """Tokens in the system prompt and in the rest of the history, from the counts kept per message."""
+        return self.system_tokens, self.tokens - self.system_tokens
+
+    def to_messages(self) -> list:
+        message_list = []
+        if self.system_message:
+            message_list.append(self.system_message)
+        message_list.extend({"role": role, "content": content} for role, content, _ in self.messages)
+        return message_list
+
+
+class ConversationStore:
+    """Conversations keyed by chat ID with LRU/TTL eviction and a total size cap.
+
+    Every chat gets its own Conversation object, so concurrent chats never share a
+    message list. The store is only touched from the event loop thread and none of
+    its methods await, which keeps it consistent without a lock.
+    """
+
+    def __init__(self, max_sessions: int = 10000, ttl: float = 3600, max_total_chars: int = 50_000_000,
+                 token_budget: int = 3000):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_total_chars = max_total_chars
+        self.token_budget = token_budget
+        self.total_chars = 0
+        self._sessions: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, key) -> bool:
+        return key in self._sessions
+
+    def peek(self, key) -> Conversation:
+        return self._sessions.get(key)
+
+    def get(self, key) -> Conversation:
+        conversation = self._sessions.get(key)
+        if conversation is None:
+            conversation = Conversation()
+            self._sessions[key] = conversation
+        else:
+            self._sessions.move_to_end(key)
+        conversation.last_used = time.monotonic()
+        self._evict()
+        return conversation
+
+    def reset(self, key, system_prompt: str = None) -> Conversation:
+        self.drop(key)
+        conversation = Conversation(system_prompt)
+        self._sessions[key] = conversation
+        self.total_chars += conversation.size
+        self._evict()
+        return conversation
+
+    def append(self, key, role: str, content: str) -> None:
+        conversation = self.get(key)
+        self.total_chars += conversation.append(role, content)
+        self.total_chars -= conversation.trim(self.token_budget)
+        self._evict()
+
+    def drop(self, key) -> None:
+        conversation = self._sessions.pop(key, None)
+        if conversation is not None:
+            self.total_chars -= conversation.size
+
+    def _evict(self) -> None:
+        expire_before = time.monotonic() - self.ttl
+        while self._sessions:
+            key, conversation = next(iter(self._sessions.items()))
+            if (conversation.last_used >= expire_before
+                    and len(self._sessions) <= self.max_sessions
+                    and (self.total_chars <= self.max_total_chars or len(self._sessions) == 1)):
+                break
+            self.drop(key)
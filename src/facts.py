@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import re
+from collections import deque
+from typing import Callable
+
+from governor import Priority
+from gpt import ChatGPTService
+
+logger = logging.getLogger(__name__)
+
+NUMBERED_ITEM = re.compile(r"^\s*\d+\s*[.)]\s*", re.MULTILINE)
+
+
+def split_items(text: str) -> list:
+    """Split a batched completion into its items, either numbered items or paragraphs."""
+    if NUMBERED_ITEM.search(text):
+        parts = NUMBERED_ITEM.split(text)[1:]
+    else:
+        parts = re.split(r"\n\s*\n", text)
+    return [part.strip() for part in parts if part.strip()]
+
+
+def parse_facts(text: str) -> list:
+    return [" ".join(part.split()) for part in split_items(text)]
+
+
+def fingerprint(fact: str) -> str:
+    return "".join(char for char in fact.lower() if char.isalnum())[:120]
+
+
+class FactPool:
+    """Bounded pool of pre-generated random facts with a background refill.
+
+    Facts are generated several at a time. When the pool drops below ``low_water``
+    a refill task runs until it is ``size`` again, or until several batches in a
+    row bring no new fact. Facts served recently are remembered so the same fact
+    is not handed out twice in a row.
+    """
+
+    def __init__(self, chatgpt_service: ChatGPTService, load_prompt: Callable[[], str], size: int = 20,
+                 low_water: int = 5, batch_size: int = 5, recent_size: int = 500):
+        self.chatgpt_service = chatgpt_service
+        self.load_prompt = load_prompt
+        self.size = size
+        self.low_water = low_water
+        self.batch_size = batch_size
+        self._facts = deque()
+        self._recent = deque(maxlen=recent_size)
+        self._seen = set()
+        self._refill_task = None
+        self._refilled = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._facts)
+
+    def start(self) -> None:
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.get_running_loop().create_task(self._refill())
+
+    async def get(self) -> str:
+        while not self._facts:
+            self.start()
+            self._refilled.clear()
+            refill_task = self._refill_task
+            waiter = asyncio.ensure_future(self._refilled.wait())
+            try:
+                await asyncio.wait([waiter, refill_task], return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                waiter.cancel()
+            if not self._facts and refill_task.done() and refill_task.exception() is not None:
+                raise refill_task.exception()
+        fact = self._facts.popleft()
+        if len(self._facts) < self.low_water:
+            self.start()
+        return fact
+
+    def _add(self, fact: str) -> bool:
+        key = fingerprint(fact)
+        if not key or key in self._seen:
+            return False
+        if len(self._recent) == self._recent.maxlen:
+            self._seen.discard(self._recent[0])
+        self._recent.append(key)
+        self._seen.add(key)
+        self._facts.append(fact)
+        return True
+
+    async def _refill(self) -> None:
+        failures = 0
+        # Batches that added nothing: every fact was a recent duplicate or the answer was empty
+        empty = 0
+        while len(self._facts) < self.size:
+            try:
+                response = await self.chatgpt_service.send_question(
+                    prompt_text=self.load_prompt(),
+                    message_text=f"Розкажи {self.batch_size} різних випадкових фактів з різних галузей. "
+                                 f"Пронумеруй їх (1., 2., ...), кожен факт з нового рядка.",
+                    priority=Priority.BACKGROUND
+                )
+            except Exception as e:
+                failures += 1
+                logger.error(f"Помилка при поповненні пулу фактів: {e}")
+                if not self._facts or failures >= 3:
+                    raise
+                await asyncio.sleep(2 ** failures)
+                continue
+            failures = 0
+            added = 0
+            for fact in parse_facts(response or ""):
+                if self._add(fact):
+                    added += 1
+                    self._refilled.set()
+            if added:
+                empty = 0
+                continue
+            empty += 1
+            if empty >= 3:
+                if not self._facts:
+                    raise RuntimeError("модель не дала жодного нового факту")
+                logger.warning(f"Поповнення пулу фактів зупинено: {empty} відповідей поспіль без нових фактів")
+                return
+            await asyncio.sleep(2 ** empty)
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+class FileIdCache:
+    """Persistent map of resource files to the file_id Telegram assigned after upload.
+
+    Keys are the file path relative to the resources directory plus a hash of its
+    contents, so replacing an image on disk forces a fresh upload. Each file is
+    hashed at most once per process.
+    """
+
+    def __init__(self, cache_path: str, base_dir: str):
+        self.cache_path = cache_path
+        self.base_dir = base_dir
+        self._file_ids = None
+        self._keys = {}
+        self._invalidated = set()
+
+    def _read(self) -> dict:
+        if self.cache_path and os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, "r", encoding="utf-8") as file:
+                    return json.load(file)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Не вдалося прочитати кеш file_id {self.cache_path}: {e}")
+        return {}
+
+    def _load(self) -> dict:
+        if self._file_ids is None:
+            self._file_ids = self._read()
+        return self._file_ids
+
+    def _save(self) -> None:
+        if not self.cache_path:
+            return
+        # Sharded workers share the file: merge in what the others saved meanwhile, and write through a
+        # temporary file of our own so concurrent saves never interleave
+        file_ids = self._read()
+        file_ids.update(self._file_ids)
+        for key in self._invalidated:
+            file_ids.pop(key, None)
+        self._invalidated.clear()
+        self._file_ids = file_ids
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.cache_path), suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as file:
+                    json.dump(file_ids, file, ensure_ascii=False, indent=1)
+                os.replace(tmp_path, self.cache_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning(f"Не вдалося зберегти кеш file_id {self.cache_path}: {e}")
+
+    def key_for(self, file_path: str) -> str:
+        key = self._keys.get(file_path)
+        if key is None:
+            with open(file_path, "rb") as file:
+                digest = hashlib.sha256(file.read()).hexdigest()
+            key = f"{os.path.relpath(file_path, self.base_dir)}:{digest}"
+            self._keys[file_path] = key
+        return key
+
+    def get(self, key: str):
+        return self._load().get(key)
+
+    def set(self, key: str, file_id: str) -> None:
+        file_ids = self._load()
+        if file_ids.get(key) != file_id:
+            file_ids[key] = file_id
+            self._save()
+
+    def invalidate(self, key: str) -> None:
+        if self._load().pop(key, None) is not None:
+            self._invalidated.add(key)
+            self._save()
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import random
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Awaitable, Callable
+
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    TRANSLATION = 1
+    BACKGROUND = 2
+
+
+class GovernorBusy(Exception):
+    pass
+
+
+def is_retryable(error: Exception) -> bool:
+    # Imported here because openai takes over half a second to import; by the time a
+    # request has failed the client, and so the module, is loaded anyway
+    import openai
+
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+class RequestGovernor:
+    """Admission control in front of the OpenAI API.
+
+    At most ``max_in_flight`` requests run at once; the rest wait in a bounded queue,
+    served by priority and round-robin between users within a priority so one chat
+    cannot starve the others. Admitted requests also draw from requests-per-minute
+    and tokens-per-minute buckets. When the queue is full, GovernorBusy is raised
+    immediately instead of making the caller wait.
+    """
+
+    def __init__(self, max_in_flight: int = 20, max_queue: int = 200, rpm: float = 3500, tpm: float = 90000,
+                 max_retries: int = 3, base_delay: float = 1.0, max_delay: float = 30.0):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.requests = TokenBucket(rpm / 60, rpm)
+        self.tokens = TokenBucket(tpm / 60, tpm)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.in_flight = 0
+        self.queue_depth = 0
+        self._queues = {priority: OrderedDict() for priority in Priority}
+
+    async def _acquire(self, priority: Priority, user_id) -> None:
+        if self.in_flight < self.max_in_flight and not self.queue_depth:
+            self.in_flight += 1
+            return
+        if self.queue_depth >= self.max_queue:
+            raise GovernorBusy()
+        waiter = asyncio.get_running_loop().create_future()
+        user_queue = self._queues[priority].setdefault(user_id, deque())
+        user_queue.append(waiter)
+        self.queue_depth += 1
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            else:
+                self._discard(user_id, waiter)
+            raise
+
+    def _discard(self, user_id, waiter: asyncio.Future) -> None:
+        # Looked up again because promote() may have moved the waiter to another priority
+        for users in self._queues.values():
+            user_queue = users.get(user_id)
+            if user_queue is not None and waiter in user_queue:
+                user_queue.remove(waiter)
+                self.queue_depth -= 1
+                if not user_queue:
+                    del users[user_id]
+                return
+
+    def promote(self, user_id, priority: Priority) -> None:
+        """Move ``user_id``'s requests still waiting at a lower priority up to ``priority``."""
+        target = self._queues[priority]
+        for lower in Priority:
+            if lower > priority:
+                waiters = self._queues[lower].pop(user_id, None)
+                if waiters:
+                    target.setdefault(user_id, deque()).extend(waiters)
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        while self.in_flight < self.max_in_flight and self.queue_depth:
+            users = next(queue for queue in self._queues.values() if queue)
+            user_id, user_queue = next(iter(users.items()))
+            waiter = user_queue.popleft()
+            if user_queue:
+                users.move_to_end(user_id)
+            else:
+                del users[user_id]
+            self.queue_depth -= 1
+            if waiter.done():
+                # Cancelled in the same loop tick; its task never got the slot, so hand it to the next one
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority = Priority.INTERACTIVE, user_id=None, tokens: int = 0):
+        await self._acquire(priority, user_id)
+        try:
+            delay = max(self.requests.reserve(), self.tokens.reserve(tokens))
+            if delay:
+                await asyncio.sleep(delay)
+            yield
+        finally:
+            self._release()
+
+    async def call(self, request: Callable[[], Awaitable], tokens: int = 0):
+        """Run ``request`` and retry 429/5xx/connection errors with jittered exponential backoff.
+
+        Every retry is a new API request, so it draws ``tokens`` and one request from the buckets again.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await request()
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+                delay = random.uniform(delay / 2, delay)
+                retry_after = getattr(getattr(e, "response", None), "headers", {}).get("retry-after")
+                try:
+                    # Jitter only the backoff: retrying before the server-mandated wait just earns another 429
+                    delay = max(delay, float(retry_after))
+                except (TypeError, ValueError):
+                    pass
+                delay = max(delay, self.requests.reserve(), self.tokens.reserve(tokens))
+                logger.warning(f"Помилка OpenAI ({e.__class__.__name__}), повтор через {delay:.1f} с")
+                await asyncio.sleep(delay)
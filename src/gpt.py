@@ -1,39 +1,226 @@
-from openai import OpenAI
+import json
+import logging
+import re
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
 import httpx
 
+import metrics
+from cache import ResponseCache
+from conversations import ConversationStore
+from governor import Priority, RequestGovernor
+from prompts import split_prompt_tokens, system_message
+from singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def parse_json_answer(answer: Optional[str]):
+    """The JSON value in a completion, tolerating a Markdown code fence around it; None if there is none."""
+    if not answer:
+        return None
+    try:
+        return json.loads(_FENCE.sub("", answer.strip()))
+    except ValueError:
+        return None
+
 
 class ChatGPTService:
-    client: OpenAI = None
-    message_list: list = None
+    """OpenAI chat completions behind the governor, the response cache and single-flight.
+
+    The HTTP client (and the openai package itself) is created on first use, so
+    constructing the service is cheap and opens no connections.
+    """
 
-    def __init__(self, token):
-        self.client = OpenAI(
-            http_client=httpx.Client(proxy="http://18.199.183.77:49232"),
-            api_key=token
+    conversations: ConversationStore = None
+
+    def __init__(self, token, proxy: str = None, max_connections: int = 100, max_keepalive_connections: int = 20,
+                 connect_timeout: float = 10.0, request_timeout: float = 60.0,
+                 conversations: ConversationStore = None, model: str = "gpt-3.5-turbo", max_tokens: int = 3000,
+                 temperature: float = 0.9, cache: ResponseCache = None, governor: RequestGovernor = None,
+                 base_url: str = None):
+        self.token = token
+        self.base_url = base_url
+        self.proxy = proxy
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections
         )
-        self.message_list = []
-
-    async def send_message_list(self) -> str:
-        completion = self.client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=self.message_list,
-            max_tokens=3000,
-            temperature=0.9
+        self.timeout = httpx.Timeout(request_timeout, connect=connect_timeout)
+        self._client = None
+        self.conversations = conversations if conversations is not None else ConversationStore()
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.cache = cache
+        self.governor = governor if governor is not None else RequestGovernor()
+        self.single_flight = SingleFlight()
+
+    @property
+    def client(self) -> "AsyncOpenAI":
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(
+                http_client=httpx.AsyncClient(proxy=self.proxy, limits=self.limits, timeout=self.timeout),
+                api_key=self.token,
+                base_url=self.base_url,
+                # Retries are done by the governor so they respect its backoff and queue
+                max_retries=0
+            )
+        return self._client
+
+    def _estimate_tokens(self, message_list: list, prompt_tokens: tuple = None) -> int:
+        """Prompt plus completion tokens to reserve; ``prompt_tokens`` skips tokenizing a known conversation."""
+        prefix, suffix = prompt_tokens if prompt_tokens is not None else split_prompt_tokens(message_list)
+        metrics.OPENAI_PROMPT_TOKENS.inc(prefix, "prefix")
+        metrics.OPENAI_PROMPT_TOKENS.inc(suffix, "suffix")
+        logger.debug(f"Промпт: {prefix} токенів у спільному префіксі, {suffix} у змінній частині")
+        return prefix + suffix + self.max_tokens
+
+    def _create(self, message_list: list, tokens: int, temperature: float = None, stream: bool = False,
+                json_mode: bool = False):
+        extra = {"stream": True, "stream_options": {"include_usage": True}} if stream else {}
+        if json_mode:
+            extra["response_format"] = {"type": "json_object"}
+        return self.governor.call(lambda: self.client.chat.completions.create(
+            model=self.model,
+            messages=message_list,
+            max_tokens=self.max_tokens,
+            temperature=self.temperature if temperature is None else temperature,
+            **extra
+        ), tokens)
+
+    @staticmethod
+    def _record_usage(usage) -> None:
+        if usage is not None:
+            metrics.OPENAI_TOKENS.inc(usage.prompt_tokens, "prompt")
+            metrics.OPENAI_TOKENS.inc(usage.completion_tokens, "completion")
+            details = getattr(usage, "prompt_tokens_details", None)
+            if details is not None and details.cached_tokens:
+                metrics.OPENAI_TOKENS.inc(details.cached_tokens, "cached")
+
+    async def send_message_list(self, message_list: list, temperature: float = None,
+                                priority: Priority = Priority.INTERACTIVE, user_id=None, json_mode: bool = False) -> str:
+        tokens = self._estimate_tokens(message_list)
+        async with self.governor.slot(priority, user_id, tokens):
+            started = time.perf_counter()
+            completion = await self._create(message_list, tokens, temperature, json_mode=json_mode)
+            elapsed = time.perf_counter() - started
+        metrics.OPENAI_LATENCY.observe(elapsed, "completion")
+        metrics.record_span("openai", elapsed)
+        self._record_usage(completion.usage)
+        return completion.choices[0].message.content
+
+    async def stream_message_list(self, message_list: list, temperature: float = None,
+                                  priority: Priority = Priority.INTERACTIVE, user_id=None,
+                                  prompt_tokens: tuple = None) -> AsyncIterator[str]:
+        tokens = self._estimate_tokens(message_list, prompt_tokens)
+        async with self.governor.slot(priority, user_id, tokens):
+            started = time.perf_counter()
+            first_token = True
+            stream = await self._create(message_list, tokens, temperature, stream=True)
+            async for chunk in stream:
+                self._record_usage(chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first_token:
+                        first_token = False
+                        metrics.OPENAI_FIRST_TOKEN.observe(time.perf_counter() - started)
+                    yield chunk.choices[0].delta.content
+            elapsed = time.perf_counter() - started
+            metrics.OPENAI_LATENCY.observe(elapsed, "stream")
+            metrics.record_span("openai.stream", elapsed)
+
+    def set_prompt(self, chat_id, prompt_text: str) -> None:
+        self.conversations.reset(chat_id, prompt_text)
+
+    async def stream_message(self, chat_id, message_text: str) -> AsyncIterator[str]:
+        self.conversations.append(chat_id, "user", message_text)
+        conversation = self.conversations.get(chat_id)
+        parts = []
+        async for delta in self.stream_message_list(conversation.to_messages(), user_id=chat_id,
+                                                    prompt_tokens=conversation.prompt_tokens()):
+            parts.append(delta)
+            yield delta
+        # The chat may have been reset or evicted while the completion was in flight
+        if self.conversations.peek(chat_id) is conversation:
+            self.conversations.append(chat_id, "assistant", "".join(parts))
+
+    def _cache_key(self, prompt_text: str, message_text: str, temperature: float) -> str:
+        return ResponseCache.make_key(
+            prompt_text,
+            message_text,
+            self.model,
+            max_tokens=self.max_tokens,
+            temperature=self.temperature if temperature is None else temperature
         )
-        message = completion.choices[0].message
-        self.message_list.append(message)
-        return message.content
-
-    def set_prompt(self, prompt_text: str) -> None:
-        self.message_list.clear()
-        self.message_list.append({"role": "system", "content": prompt_text})
-
-    async def add_message(self, message_text: str) -> str:
-        self.message_list.append({"role": "user", "content": message_text})
-        return await self.send_message_list()
-
-    async def send_question(self, prompt_text: str, message_text: str) -> str:
-        self.message_list.clear()
-        self.message_list.append({"role": "system", "content": prompt_text})
-        self.message_list.append({"role": "user", "content": message_text})
-        return await self.send_message_list()
\ No newline at end of file
+
+    async def cached_answer(self, prompt_text: str, message_text: str, temperature: float = None) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return await self.cache.get(self._cache_key(prompt_text, message_text, temperature))
+
+    def cache_answer(self, prompt_text: str, message_text: str, answer: str, ttl: float,
+                     temperature: float = None) -> None:
+        if self.cache is not None and answer:
+            self.cache.set(self._cache_key(prompt_text, message_text, temperature), answer, ttl)
+
+    async def send_question(self, prompt_text: str, message_text: str, temperature: float = None,
+                            cache_ttl: float = None, priority: Priority = Priority.INTERACTIVE, user_id=None) -> str:
+        """Ask a one-off question; with ``cache_ttl`` the answer is served from and stored in the response cache.
+
+        Identical questions asked while one is in flight share its answer instead of calling the API again.
+        """
+        cache_key = self._cache_key(prompt_text, message_text, temperature)
+        if cache_ttl and self.cache is not None:
+            answer = await self.cache.get(cache_key)
+            if answer is not None:
+                return answer
+
+        async def ask():
+            answer = await self.send_message_list([
+                system_message(prompt_text),
+                {"role": "user", "content": message_text},
+            ], temperature, priority, user_id)
+            if cache_ttl and self.cache is not None and answer:
+                self.cache.set(cache_key, answer, cache_ttl)
+            return answer
+
+        return await self.single_flight.call(("question", cache_key), ask)
+
+    async def stream_question(self, prompt_text: str, message_text: str, temperature: float = None,
+                              cache_ttl: float = None, priority: Priority = Priority.INTERACTIVE,
+                              user_id=None) -> AsyncIterator[str]:
+        cache_key = self._cache_key(prompt_text, message_text, temperature)
+        if cache_ttl and self.cache is not None:
+            answer = await self.cache.get(cache_key)
+            if answer is not None:
+                yield answer
+                return
+
+        async def ask():
+            parts = []
+            async for delta in self.stream_message_list([
+                system_message(prompt_text),
+                {"role": "user", "content": message_text},
+            ], temperature, priority, user_id):
+                parts.append(delta)
+                yield delta
+            if cache_ttl and self.cache is not None and parts:
+                self.cache.set(cache_key, "".join(parts), cache_ttl)
+
+        async for delta in self.single_flight.stream(("stream", cache_key), ask):
+            yield delta
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+        if self.cache is not None:
+            await self.cache.close()
@@ -1,63 +1,131 @@
 import logging
+import os
 from random import choice
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
+from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 
-from config import (CHATGPT_TOKEN, LANGUAGES)
+from config import Config, LANGUAGES
+from cache import ResponseCache
+from conversations import ConversationStore
+from facts import FactPool
 from gpt import ChatGPTService
-from utils import (send_image, send_text, load_message, show_main_menu, load_prompt, send_text_buttons)
+from governor import GovernorBusy, RequestGovernor
+from intents import IntentClassifier
+from keyboards import (CHANGE_LANGUAGE, LANGUAGE_MENU, RANDOM_MENU, RECOMMEND_CATEGORIES, RECOMMENDATION,
+                       TALK_FINISH, TALK_MENU)
+from menu import MenuManager
+from recommendations import Recommender
+from states import StateHandler, StateRouter
+from translation import Translator
+from utils import (send_image, send_text, load_message, load_prompt, send_text_buttons,
+                   send_streamed_text, file_id_cache, RESOURCES_DIR)
 
 
 
-chatgpt_service = ChatGPTService(CHATGPT_TOKEN)
-
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
+BUSY_TEXT = "⏳ Зараз надто багато запитів. Спробуйте, будь ласка, за хвилину."
+
+# Built by setup() from the application's Config; importing this module creates no clients or tasks
+config: Config = None
+chatgpt_service: ChatGPTService = None
+fact_pool: FactPool = None
+recommender: Recommender = None
+translator: Translator = None
+
+intent_classifier = IntentClassifier(os.path.join(RESOURCES_DIR, "intents.json"))
+
+main_menu = MenuManager({
+    'start': 'Головне меню',
+    'random': 'Дізнатися випадковий факт',
+    'gpt': 'Запитати ChatGPT',
+    'talk': 'Діалог з відомою особистістю',
+    'translate': 'Перекладач текстів',
+    'recommend': 'Рекомендації від GPT',
+})
+
+TALK_PERSONALITIES = ("talk_linus_torvalds", "talk_guido_van_rossum", "talk_mark_zuckerberg")
+
+REQUIRED_RESOURCES = {
+    "prompts": ["random", "gpt", "recommend", *TALK_PERSONALITIES],
+    "messages": ["start"],
+}
+
+
+def setup(app_config: Config) -> None:
+    """Create the services the handlers share. No network connection is opened until the first request."""
+    global config, chatgpt_service, fact_pool, recommender, translator
+    config = app_config
+    file_id_cache.cache_path = config.file_id_cache_path or None
+    chatgpt_service = ChatGPTService(
+        config.chatgpt_token,
+        base_url=config.openai_base_url,
+        proxy=config.openai_proxy,
+        max_connections=config.openai_max_connections,
+        max_keepalive_connections=config.openai_max_keepalive_connections,
+        connect_timeout=config.openai_connect_timeout,
+        request_timeout=config.openai_request_timeout,
+        conversations=ConversationStore(
+            max_sessions=config.conversation_max_sessions,
+            ttl=config.conversation_ttl,
+            max_total_chars=config.conversation_max_chars,
+            token_budget=config.history_token_budget
+        ),
+        model=config.openai_model,
+        max_tokens=config.openai_max_tokens,
+        cache=ResponseCache(max_entries=config.response_cache_size, disk_path=config.response_cache_path or None),
+        governor=RequestGovernor(
+            max_in_flight=config.openai_max_in_flight,
+            max_queue=config.openai_max_queue,
+            rpm=config.openai_rpm,
+            tpm=config.openai_tpm,
+            max_retries=config.openai_max_retries
+        )
+    )
+    fact_pool = FactPool(
+        chatgpt_service,
+        lambda: load_prompt("random"),
+        size=config.fact_pool_size,
+        low_water=config.fact_pool_low_water,
+        batch_size=config.fact_batch_size
+    )
+    recommender = Recommender(
+        chatgpt_service,
+        lambda: load_prompt("recommend"),
+        batch_size=config.recommendation_batch_size,
+        low_water=config.recommendation_low_water,
+        max_excluded=config.recommendation_max_excluded
+    )
+    translator = Translator(chatgpt_service, LANGUAGES, config.translation_cache_ttl)
+
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await send_image(update, context, "start")
     await send_text(update, context, load_message("start"))
-    await show_main_menu(
-        update,
-        context,
-        {
-            'start': 'Головне меню',
-            'random': 'Дізнатися випадковий факт',
-            'gpt': 'Запитати ChatGPT',
-            'talk': 'Діалог з відомою особистістю',
-            'translate': 'Перекладач текстів',
-            'recommend': 'Рекомендації від GPT',
-        }
-    )
+    await main_menu.sync_chat(update, context)
 
 
 async def random(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await send_image(update, context, "random")
-    message_to_delete = await send_text(update, context, "Шукаю випадковий факт ...")
+    message_to_delete = None
+    if not len(fact_pool):
+        message_to_delete = await send_text(update, context, "Шукаю випадковий факт ...")
     try:
-        prompt = load_prompt("random")
-        fact = await chatgpt_service.send_question(
-            prompt_text=prompt,
-            message_text="Розкажи про випадковий факт"
-        )
-        buttons = {
-            'random': 'Хочу ще один факт',
-            'start': 'Закінчити'
-        }
-        await send_text_buttons(update, context, fact, buttons)
+        fact = await fact_pool.get()
+        await send_text_buttons(update, context, fact, RANDOM_MENU)
+    except GovernorBusy:
+        await send_text(update, context, BUSY_TEXT)
     except Exception as e:
         logger.error(f"Помилка в обробнику /random: {e}")
         await send_text(update, context, "Помилка при отриманні випадкового факту.")
     finally:
-        await context.bot.delete_message(
-            chat_id=update.effective_chat.id,
-            message_id=message_to_delete.message_id
-        )
+        if message_to_delete is not None:
+            await context.bot.delete_message(
+                chat_id=update.effective_chat.id,
+                message_id=message_to_delete.message_id
+            )
 
 
 async def random_button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -73,71 +141,50 @@ async def random_button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 async def gpt(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data.clear()
     await send_image(update, context, "gpt")
-    chatgpt_service.set_prompt(load_prompt("gpt"))
+    chatgpt_service.set_prompt(update.effective_chat.id, load_prompt("gpt"))
     await send_text(update, context, "Задайте питання ...")
     context.user_data["conversation_state"] = "gpt"
 
 
-async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    message_text = update.message.text
-    conversation_state = context.user_data.get("conversation_state")
+class TranslateState(StateHandler):
+    state = "translate"
 
-    if conversation_state == "translate":
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE, message_text: str) -> None:
         target_lang = context.user_data.get("target_language")
         if not target_lang:
             await send_text(update, context, "Спочатку оберіть мову для перекладу!")
             return
 
-        waiting_message = await send_text(update, context, "⏳ Перекладаю...")
-
+        # Kept so the change_ and translate_all buttons can re-translate it from the cache
+        context.user_data["translate_text"] = message_text
         try:
-
-            prompt = f"You are a professional translator. Translate the following text to {LANGUAGES[target_lang]}. Provide only the translation without any additional comments."
-
-
-            response = await chatgpt_service.send_question(
-                prompt_text=prompt,
-                message_text=message_text
+            await send_streamed_text(
+                update,
+                context,
+                translator.stream(target_lang, message_text, user_id=update.effective_chat.id),
+                prefix=f"📝 *Переклад ({LANGUAGES[target_lang]}):*\n\n",
+                suffix="\n\n━━━━━━━━━━━━━━━\nНадішліть інший текст або оберіть дію:",
+                reply_markup=CHANGE_LANGUAGE[target_lang],
+                parse_mode="Markdown",
+                edit_interval=config.stream_edit_interval
             )
 
-            keyboard = []
-            other_langs = [lang for lang in LANGUAGES.keys() if lang != target_lang]
-            for i in range(0, len(other_langs), 2):
-                row = []
-                for code in other_langs[i:i + 2]:
-                    row.append(
-                        InlineKeyboardButton(
-                            LANGUAGES[code],
-                            callback_data=f"change_{code}"
-                        )
-                    )
-                keyboard.append(row)
-
-            keyboard.append([
-                InlineKeyboardButton("❌ Закінчити", callback_data="finish_translate")
-            ])
-
-            reply_markup = InlineKeyboardMarkup(keyboard)
-
-            await context.bot.send_message(
-                chat_id=update.effective_chat.id,
-                text=f"📝 *Переклад ({LANGUAGES[target_lang]}):*\n\n{response}\n\n"
-                         f"━━━━━━━━━━━━━━━\nНадішліть інший текст або оберіть дію:",
-                reply_markup=reply_markup,
-                parse_mode="Markdown"
-            )
+        except GovernorBusy:
+            await send_text(update, context, BUSY_TEXT)
 
         except Exception as e:
             logger.error(f"Помилка при перекладі: {e}")
             await send_text(update, context, "❌ Помилка при перекладі. Спробуйте ще раз.")
-        finally:
-            await context.bot.delete_message(
-                chat_id=update.effective_chat.id,
-                message_id=waiting_message.message_id
-            )
-        return
 
-    if conversation_state == "recommend_genre":
+
+def format_recommendation(item: dict) -> str:
+    return f"📌 {item['title']}\n{item['description']}"
+
+
+class RecommendGenreState(StateHandler):
+    state = "recommend_genre"
+
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE, message_text: str) -> None:
         genre = message_text.strip()
         category = context.user_data.get("rec_category")
 
@@ -145,43 +192,26 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await send_text(update, context, "Помилка: категорія не обрана. Використайте /recommend")
             return
 
-        context.user_data["rec_genre"] = genre
-        context.user_data["rec_disliked"] = []
+        recommender.reset(context.user_data, category, genre)
 
         waiting_message = await send_text(update, context, "⏳ Шукаю найкращі рекомендації...")
 
         try:
-            base_prompt = load_prompt("recommend")
-
-            prompt = f"""{base_prompt}
-
-        Порекомендуй одну річ у категорії "{category}" в жанрі "{genre}". 
-        Дай ОДНУ конкретну рекомендацію з коротким описом (2-3 речення).
-
-        Формат відповіді:
-        📌 Назва
-        Короткий опис чому це круто."""
-
-            response = await chatgpt_service.send_question(
-                prompt_text=prompt,
-                message_text=""
-            )
-            lines = response.split('\n')
-            recommendation_name = lines[0].replace('📌', '').strip() if lines else "Unknown"
-            context.user_data["rec_disliked"] = [recommendation_name]
-
-            buttons = {
-                'rec_dislike': '👎 Не подобається',
-                'start': '❌ Закінчити'
-            }
+            item = await recommender.next(context.user_data, update.effective_chat.id)
+            if item is None:
+                await send_text(update, context, "Не вдалося знайти рекомендації. Спробуйте інший жанр.")
+                return
 
             await send_text_buttons(
                 update,
                 context,
-                f"🎯 *Рекомендація ({category}):*\n\n{response}",
-                buttons
+                f"🎯 *Рекомендація ({category}):*\n\n{format_recommendation(item)}",
+                RECOMMENDATION
             )
 
+        except GovernorBusy:
+            await send_text(update, context, BUSY_TEXT)
+
         except Exception as e:
             logger.error(f"Помилка при отриманні рекомендації: {e}")
             await send_text(update, context, "❌ Виникла помилка при отриманні рекомендації.")
@@ -191,62 +221,86 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             chat_id=update.effective_chat.id,
             message_id=waiting_message.message_id
             )
-        return
 
 
-    if conversation_state == "gpt":
-        waiting_message = await send_text(update, context, "...")
+class GptState(StateHandler):
+    state = "gpt"
+
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE, message_text: str) -> None:
+        chat_id = update.effective_chat.id
+        if chat_id not in chatgpt_service.conversations:
+            chatgpt_service.set_prompt(chat_id, load_prompt("gpt"))
         try:
-            response = await chatgpt_service.add_message(message_text)
-            await send_text(update, context, response)
+            await send_streamed_text(
+                update,
+                context,
+                chatgpt_service.stream_message(chat_id, message_text),
+                parse_mode=ParseMode.MARKDOWN,
+                edit_interval=config.stream_edit_interval
+            )
+        except GovernorBusy:
+            await send_text(update, context, BUSY_TEXT)
         except Exception as e:
             logger.error(f"Помилка при отриманні відповіді від ChatGPT: {e}")
             await send_text(update, context, "Виникла помилка при обробці вашого повідомлення.")
-        finally:
-            await context.bot.delete_message(
-                chat_id=update.effective_chat.id,
-                message_id=waiting_message.message_id
-            )
-    if conversation_state == "talk":
+
+
+class TalkState(StateHandler):
+    state = "talk"
+
+    def __init__(self):
+        self.names = {
+            personality: personality.replace("talk_", "").replace("_", " ").title()
+            for personality in TALK_PERSONALITIES
+        }
+
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE, message_text: str) -> None:
         personality = context.user_data.get("selected_personality")
+        chat_id = update.effective_chat.id
         if personality:
-            prompt = load_prompt(personality)
-            chatgpt_service.set_prompt(prompt)
+            if chat_id not in chatgpt_service.conversations:
+                chatgpt_service.set_prompt(chat_id, load_prompt(personality))
         else:
             await send_text(update, context, "Спочатку оберіть особистість для розмови!")
             return
-        waiting_message = await send_text(update, context, "...")
         try:
-            response = await chatgpt_service.add_message(message_text)
-            buttons = {"start": "Закінчити"}
-            personality_name = personality.replace("talk_", "").replace("_", " ").title()
-            await send_text_buttons(update, context, f"{personality_name}: {response}", buttons)
+            await send_streamed_text(
+                update,
+                context,
+                chatgpt_service.stream_message(chat_id, message_text),
+                prefix=f"{self.names[personality]}: ",
+                reply_markup=TALK_FINISH,
+                edit_interval=config.stream_edit_interval
+            )
+        except GovernorBusy:
+            await send_text(update, context, BUSY_TEXT)
         except Exception as e:
             logger.error(f"Помилка при отриманні відповіді від ChatGPT: {e}")
             await send_text(update, context, "Виникла помилка при отриманні відповіді!")
-            await context.bot.delete_message(chat_id=update.effective_chat.id, message_id=waiting_message.message_id)
-        finally:
-            await context.bot.delete_message(
-                chat_id=update.effective_chat.id,
-                message_id=waiting_message.message_id
-            )
-    if not conversation_state:
+
+
+class NoState(StateHandler):
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE, message_text: str) -> None:
         intent_recognized = await inter_random_input(update, context, message_text)
         if not intent_recognized:
             await show_funny_response(update, context)
-        return
+
+
+translate_state = TranslateState()
+
+state_router = StateRouter()
+for state_handler in (translate_state, RecommendGenreState(), GptState(), TalkState(), NoState()):
+    state_router.register(state_handler)
+
+
+async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await state_router.dispatch(update, context)
 
 
 async def talk(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data.clear()
     await send_image(update, context, "talk")
-    personalities = {
-        'talk_linus_torvalds': "Linus Torvalds (Linux, Git)",
-        'talk_guido_van_rossum': "Guido van Rossum (Python)",
-        'talk_mark_zuckerberg': "Mark Zuckerberg (Meta, Facebook)",
-        'start': "Закінчити",
-    }
-    await send_text_buttons(update, context, "Оберіть особистість для спілкування ...", personalities)
+    await send_text_buttons(update, context, "Оберіть особистість для спілкування ...", TALK_MENU)
 
 
 async def talk_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -263,49 +317,26 @@ async def talk_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
         context.user_data["selected_personality"] = data
         context.user_data["conversation_state"] = "talk"
         prompt = load_prompt(data)
-        chatgpt_service.set_prompt(prompt)
+        chatgpt_service.set_prompt(update.effective_chat.id, prompt)
         personality_name = data.replace("talk_", "").replace("_", " ").title()
         await send_image(update, context, data)
-        buttons = {'start': "Закінчити"}
         await send_text_buttons(
             update,
             context,
             f"Hello, I`m {personality_name}."
             f"\nI heard you wanted to ask me something. "
             f"\nYou can ask questions in your native language.",
-            buttons
+            TALK_FINISH
         )
 
 
 async def inter_random_input(update: Update, context: ContextTypes.DEFAULT_TYPE, message_text):
-    message_text_lower = message_text.lower()
-    if any(keyword in message_text_lower for keyword in ['факт', 'цікав', 'random', 'випадков']):
-        await send_text(
-            update,
-            context,
-            text="Схоже, ви цікавитесь випадковими фактами! Зараз покажу вам один..."
-        )
-        await random(update, context)
-        return True
-
-    elif any(keyword in message_text_lower for keyword in ['gpt', 'чат', 'питання', 'запита', 'дізнатися']):
-        await send_text(
-            update,
-            context,
-            text="Схоже, у вас є питання! Переходимо до режиму спілкування з ChatGPT..."
-        )
-        await gpt(update, context)
-        return True
-
-    elif any(keyword in message_text_lower for keyword in ['розмов', 'говори', 'спілкува', 'особист', 'talk']):
-        await send_text(
-            update,
-            context,
-            text="Схоже, ви хочете поговорити з відомою особистістю! Зараз покажу вам доступні варіанти..."
-        )
-        await talk(update, context)
-        return True
-    return False
+    intent = intent_classifier.classify(message_text)
+    if intent is None or intent.name not in INTENT_ACTIONS:
+        return False
+    await send_text(update, context, text=intent.reply)
+    await INTENT_ACTIONS[intent.name](update, context)
+    return True
 
 
 async def show_funny_response(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -331,32 +362,18 @@ async def show_funny_response(update: Update, context: ContextTypes.DEFAULT_TYPE
 
 
 async def translate(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    from config import LANGUAGES
-
     context.user_data.clear()
     await send_image(update, context, "start")
 
-    keyboard = []
-    for i in range(0, len(LANGUAGES), 2):
-        row = []
-        items = list(LANGUAGES.items())[i:i + 2]
-        for code, name in items:
-            row.append(InlineKeyboardButton(name, callback_data=f"lang_{code}"))
-        keyboard.append(row)
-
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
     await context.bot.send_message(
         chat_id=update.effective_chat.id,
         text="🌍 *Режим перекладача*\n\nОберіть мову, на яку хочете перекладати тексти:",
-        reply_markup=reply_markup,
+        reply_markup=LANGUAGE_MENU,
         parse_mode="Markdown"
     )
 
 
 async def translate_language_selected(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    from config import LANGUAGES
-
     query = update.callback_query
     await query.answer()
 
@@ -372,13 +389,12 @@ async def translate_language_selected(update: Update, context: ContextTypes.DEFA
 
 
 async def translate_change_language(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    from config import LANGUAGES
-
     query = update.callback_query
     await query.answer()
 
     if query.data == "finish_translate":
         context.user_data.pop("target_language", None)
+        context.user_data.pop("translate_text", None)
         context.user_data.pop("conversation_state", None)
         await query.edit_message_text(
             "✅ Режим перекладу завершено.\n\n"
@@ -387,6 +403,10 @@ async def translate_change_language(update: Update, context: ContextTypes.DEFAUL
     else:
         lang_code = query.data.replace("change_", "")
         context.user_data["target_language"] = lang_code
+        text = context.user_data.get("translate_text")
+        if text:
+            await translate_state.handle(update, context, text)
+            return
         await query.edit_message_text(
             f"✅ Мову змінено на: *{LANGUAGES[lang_code]}*\n\n"
             f"Надішліть текст для перекладу.",
@@ -394,22 +414,48 @@ async def translate_change_language(update: Update, context: ContextTypes.DEFAUL
         )
 
 
+async def _translation_sections(translations: dict):
+    for code, translation in translations.items():
+        yield f"*{LANGUAGES[code]}:*\n{translation}\n\n"
+
+
+async def translate_all(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    text = context.user_data.get("translate_text")
+    if not text:
+        await query.answer("Спочатку надішліть текст для перекладу.")
+        return
+    await query.answer("Перекладаю всіма мовами...")
+
+    try:
+        translations = await translator.translate_all(text, user_id=update.effective_chat.id)
+        await send_streamed_text(
+            update,
+            context,
+            _translation_sections(translations),
+            prefix="🌐 *Переклад усіма мовами:*\n\n",
+            reply_markup=CHANGE_LANGUAGE.get(context.user_data.get("target_language")),
+            parse_mode="Markdown",
+            edit_interval=config.stream_edit_interval
+        )
+
+    except GovernorBusy:
+        await send_text(update, context, BUSY_TEXT)
+
+    except Exception as e:
+        logger.error(f"Помилка при пакетному перекладі: {e}")
+        await send_text(update, context, "❌ Помилка при перекладі. Спробуйте ще раз.")
+
+
 async def recommend(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data.clear()
     await send_image(update, context, "start")
 
-    categories = {
-        'rec_movies': '🎬 Фільми',
-        'rec_books': '📚 Книги',
-        'rec_music': '🎵 Музика',
-        'start': '❌ Закінчити'
-    }
-
     await send_text_buttons(
         update,
         context,
         "🎯 *Рекомендації від GPT*\n\nОберіть категорію для отримання рекомендацій:",
-        categories
+        RECOMMEND_CATEGORIES
     )
 
 
@@ -452,65 +498,39 @@ async def recommend_dislike(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     category = context.user_data.get("rec_category")
     genre = context.user_data.get("rec_genre")
-    disliked = context.user_data.get("rec_disliked", [])
 
     if not category or not genre:
         await query.edit_message_text("Помилка: дані втрачено. Використайте /recommend для початку.")
         return
 
-    await query.edit_message_text("⏳ Шукаю нові рекомендації...")
-
     try:
-        base_prompt = load_prompt("recommend")
-
-        disliked_text = ""
-        if disliked:
-            disliked_text = f"\n\nНЕ рекомендуй ці варіанти (вони вже не сподобались): {', '.join(disliked)}"
-
-
-        prompt = f"""{base_prompt}
-
-Порекомендуй одну річ у категорії "{category}" в жанрі "{genre}". 
-Дай ОДНУ конкретну рекомендацію з коротким описом (2-3 речення).{disliked_text}
-
-Формат відповіді:
-📌 Назва
-Короткий опис чому це круто."""
-
-        response = await chatgpt_service.send_question(
-            prompt_text=prompt,
-            message_text=""
-            )
-
-        lines = response.split('\n')
-        recommendation_name = lines[0].replace('📌', '').strip() if lines else "Unknown"
-
-        disliked.append(recommendation_name)
-        context.user_data["rec_disliked"] = disliked
+        if not recommender.has_next(context.user_data):
+            await query.edit_message_text("⏳ Шукаю нові рекомендації...")
+        item = await recommender.next(context.user_data, update.effective_chat.id)
+        if item is None:
+            await query.edit_message_text("Більше рекомендацій не знайшлося. Використайте /recommend, щоб змінити жанр.")
+            return
 
         await query.edit_message_text(
-            f"🎯 *Рекомендація ({category}):*\n\n{response}",
-            parse_mode="Markdown"
-        )
-        buttons = {
-            'rec_dislike': '👎 Не подобається',
-            'start': '❌ Закінчити'
-            }
-
-        keyboard = []
-        for key, value in buttons.items():
-            button = InlineKeyboardButton(str(value), callback_data=str(key))
-            keyboard.append([button])
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
-            text="Оберіть дію:",
-            reply_markup=reply_markup
+            f"🎯 *Рекомендація ({category}):*\n\n{format_recommendation(item)}",
+            parse_mode="Markdown",
+            reply_markup=RECOMMENDATION
         )
 
+    except GovernorBusy:
+        await query.edit_message_text(BUSY_TEXT)
+
     except Exception as e:
         logger.error(f"Помилка при генерації рекомендації: {e}")
         await query.edit_message_text(
              "❌ Виникла помилка при генерації рекомендації. Спробуйте ще раз."
-        )
\ No newline at end of file
+        )
+
+
+INTENT_ACTIONS = {
+    "random": random,
+    "gpt": gpt,
+    "talk": talk,
+    "translate": translate,
+    "recommend": recommend,
+}
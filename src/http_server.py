@@ -0,0 +1,68 @@
+import asyncio
+import logging
+from http import HTTPStatus
+from typing import AsyncIterator, Awaitable, Callable, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# handler(method, path, headers, body) -> (status, content_type, body); an async iterator body is sent chunked
+RequestHandler = Callable[[str, str, dict, bytes], Awaitable[Tuple[int, str, Union[bytes, AsyncIterator[bytes]]]]]
+
+MAX_BODY_SIZE = 10 * 1024 * 1024
+
+
+async def _handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                             handler: RequestHandler) -> None:
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            method, path, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length") or 0)
+            if length > MAX_BODY_SIZE:
+                status, content_type, body = 413, "text/plain", b""
+            else:
+                request_body = await reader.readexactly(length)
+                try:
+                    status, content_type, body = await handler(method, path, headers, request_body)
+                except Exception as e:
+                    logger.error(f"Помилка обробки HTTP-запиту {method} {path}: {e}")
+                    status, content_type, body = 500, "text/plain", b""
+            keep_alive = headers.get("connection", "").lower() != "close" and length <= MAX_BODY_SIZE
+            head = (
+                f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            )
+            if isinstance(body, bytes):
+                writer.write(f"{head}Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+            else:
+                writer.write(f"{head}Transfer-Encoding: chunked\r\n\r\n".encode("latin-1"))
+                async for chunk in body:
+                    writer.write(f"{len(chunk):x}\r\n".encode("latin-1") + chunk + b"\r\n")
+                    await writer.drain()
+                writer.write(b"0\r\n\r\n")
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_http_server(handler: RequestHandler, host: str, port: int) -> asyncio.AbstractServer:
+    """Minimal HTTP/1.1 server for internal endpoints, so no web framework is needed."""
+    return await asyncio.start_server(
+        lambda reader, writer: _handle_connection(reader, writer, handler),
+        host,
+        port
+    )
@@ -0,0 +1,129 @@
+import json
+import re
+from collections import deque
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+import metrics
+
+_WORD = re.compile(r"\w+")
+_APOSTROPHES = str.maketrans("", "", "'’ʼ`")
+
+# Longest first; only one ending is stripped, after an optional reflexive particle. Stems shorter
+# than _MIN_STEM are too ambiguous ("питання" -> "пит" would also match "пити" and "питома")
+_REFLEXIVE = ("ся", "сь")
+_ENDINGS = (
+    "ування", "ювання", "ання", "ення", "ння", "ити", "ати", "яти", "іти", "ути", "ого", "ому", "ими", "іми",
+    "ами", "ями", "ові", "еві", "ти", "ть", "ий", "ій", "ої", "ою", "ею", "ів", "ах", "ях", "ам", "ям", "ом",
+    "ем", "ує", "ює", "а", "я", "о", "е", "є", "і", "и", "у", "ю", "ь", "й",
+    "ations", "ation", "ions", "ion", "ings", "ing", "ed", "es", "er", "ly", "s", "e",
+)
+_MIN_STEM = 4
+
+
+@lru_cache(maxsize=4096)
+def stem(word: str) -> str:
+    """Very light suffix stripping for Ukrainian and English, enough to match inflected keywords."""
+    for suffix in _REFLEXIVE:
+        if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM:
+            word = word[:-len(suffix)]
+            break
+    for suffix in _ENDINGS:
+        if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+
+def normalize(text: str) -> str:
+    """Lowercased, stemmed words joined by single spaces, with a leading space so matches start on a word."""
+    return " " + " ".join(stem(word) for word in _WORD.findall(text.lower().translate(_APOSTROPHES))) + " "
+
+
+class Intent(NamedTuple):
+    name: str
+    reply: str
+    keywords: tuple
+
+
+class _Automaton:
+    """Aho-Corasick automaton: finds every pattern occurring in a text in one pass over it."""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+        for pattern, value in patterns:
+            node = 0
+            for char in pattern:
+                child = self.goto[node].get(char)
+                if child is None:
+                    child = len(self.goto)
+                    self.goto[node][char] = child
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                node = child
+            self.output[node] += ((pattern, value),)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and char not in self.goto[state]:
+                    state = self.fail[state]
+                target = self.goto[state].get(char, 0)
+                self.fail[child] = target if target != child else 0
+                self.output[child] += self.output[self.fail[child]]
+
+    def search(self, text: str):
+        node = 0
+        for char in text:
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            if self.output[node]:
+                yield from self.output[node]
+
+
+class IntentClassifier:
+    """Routes free text to an intent by keyword stems, without calling the model.
+
+    Intents and their keywords come from a JSON file and are compiled into one
+    automaton on first use. Each keyword matches at the start of a word, so
+    "розмов" matches "розмовляти" but "чат" does not match "початок". The intent
+    with the most distinct keyword hits wins; ties go to the one listed first.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.intents = None
+        self._automaton = None
+
+    def load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        intents = tuple(
+            Intent(entry["name"], entry["reply"], tuple(entry["keywords"])) for entry in data["intents"]
+        )
+        patterns = {}
+        for index, intent in enumerate(intents):
+            for keyword in intent.keywords:
+                patterns.setdefault(normalize(keyword).rstrip(), index)
+        self._automaton = _Automaton(patterns.items())
+        self.intents = intents
+
+    def classify(self, text: str) -> Optional[Intent]:
+        if self._automaton is None:
+            self.load()
+        hits = {}
+        for pattern, index in self._automaton.search(normalize(text)):
+            hits.setdefault(index, set()).add(pattern)
+        if not hits:
+            metrics.INTENT_MATCHES.inc(1, "none")
+            return None
+        best = min(hits, key=lambda index: (-len(hits[index]), index))
+        intent = self.intents[best]
+        metrics.INTENT_MATCHES.inc(1, intent.name)
+        return intent
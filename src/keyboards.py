@@ -0,0 +1,70 @@
+from functools import lru_cache
+from types import MappingProxyType
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from config import LANGUAGES
+
+# PTB freezes TelegramObjects after construction, so a markup built here can be
+# shared by every chat and every request without copying.
+
+
+@lru_cache(maxsize=256)
+def _column(items: tuple) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        tuple((InlineKeyboardButton(str(text), callback_data=str(data)),) for data, text in items)
+    )
+
+
+def build_buttons(buttons: dict) -> InlineKeyboardMarkup:
+    """One button per row; identical ``buttons`` dicts share a single cached markup."""
+    return _column(tuple(buttons.items()))
+
+
+def _language_grid(codes, prefix: str, footer=()) -> InlineKeyboardMarkup:
+    codes = tuple(codes)
+    rows = [
+        tuple(InlineKeyboardButton(LANGUAGES[code], callback_data=f"{prefix}{code}") for code in codes[i:i + 2])
+        for i in range(0, len(codes), 2)
+    ]
+    if footer:
+        rows.append(tuple(footer))
+    return InlineKeyboardMarkup(tuple(rows))
+
+
+FINISH_TRANSLATE = InlineKeyboardButton("❌ Закінчити", callback_data="finish_translate")
+TRANSLATE_ALL = InlineKeyboardButton("🌐 Усіма мовами", callback_data="translate_all")
+
+LANGUAGE_MENU = _language_grid(LANGUAGES, "lang_")
+
+# "All languages except X" for the reply under each translation, keyed by X.
+CHANGE_LANGUAGE = MappingProxyType({
+    target: _language_grid((code for code in LANGUAGES if code != target), "change_", (TRANSLATE_ALL, FINISH_TRANSLATE))
+    for target in LANGUAGES
+})
+
+RANDOM_MENU = build_buttons({
+    'random': 'Хочу ще один факт',
+    'start': 'Закінчити'
+})
+
+TALK_MENU = build_buttons({
+    'talk_linus_torvalds': "Linus Torvalds (Linux, Git)",
+    'talk_guido_van_rossum': "Guido van Rossum (Python)",
+    'talk_mark_zuckerberg': "Mark Zuckerberg (Meta, Facebook)",
+    'start': "Закінчити",
+})
+
+TALK_FINISH = build_buttons({'start': "Закінчити"})
+
+RECOMMEND_CATEGORIES = build_buttons({
+    'rec_movies': '🎬 Фільми',
+    'rec_books': '📚 Книги',
+    'rec_music': '🎵 Музика',
+    'start': '❌ Закінчити'
+})
+
+RECOMMENDATION = build_buttons({
+    'rec_dislike': '👎 Не подобається',
+    'start': '❌ Закінчити'
+})
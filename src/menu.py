@@ -0,0 +1,38 @@
+import hashlib
+import json
+import logging
+
+from telegram import Bot, BotCommand, BotCommandScopeChat, MenuButtonCommands, Update
+from telegram.ext import ContextTypes
+
+logger = logging.getLogger(__name__)
+
+
+class MenuManager:
+    """Keeps the bot's command menu in sync without calling the Bot API on every /start.
+
+    The commands are registered once for the default scope at startup. Each chat
+    stores the digest of the menu it was last synced to in ``chat_data``, which is
+    persisted, so a chat costs API calls only the first time it sees a menu version.
+    """
+
+    def __init__(self, commands: dict):
+        self.commands = tuple(BotCommand(command=key, description=value) for key, value in commands.items())
+        self.digest = hashlib.blake2b(
+            json.dumps(commands, ensure_ascii=False, sort_keys=True).encode("utf-8"), digest_size=8
+        ).hexdigest()
+
+    async def install(self, bot: Bot) -> None:
+        current = await bot.get_my_commands()
+        if tuple(current) != self.commands:
+            await bot.set_my_commands(self.commands)
+            logger.info("Оновлено список команд бота")
+        await bot.set_chat_menu_button(menu_button=MenuButtonCommands())
+
+    async def sync_chat(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if context.chat_data.get("menu_digest") == self.digest:
+            return
+        # Older versions pushed the menu with a per-chat scope, which would shadow
+        # the default-scope commands forever; drop it so the chat follows the default.
+        await context.bot.delete_my_commands(scope=BotCommandScopeChat(chat_id=update.effective_chat.id))
+        context.chat_data["menu_digest"] = self.digest
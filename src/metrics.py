@@ -0,0 +1,200 @@
+import asyncio
+import bisect
+import contextvars
+import functools
+import logging
+import time
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_metrics = []
+# Spans of the update being handled, or None when tracing is off
+_trace = contextvars.ContextVar("trace", default=None)
+tracing_enabled = False
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        _metrics.append(self)
+
+    def inc(self, amount: float = 1, *label_values) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class Gauge(Counter):
+    """A gauge that is either set directly or read from a function at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        super().__init__(name, documentation, labels)
+        self._function = None
+
+    def set(self, value: float, *label_values) -> None:
+        self._values[label_values] = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            yield f"{self.name} {self._function()}"
+        else:
+            yield from super().samples()
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._values = {}
+        _metrics.append(self)
+
+    def observe(self, value: float, *label_values) -> None:
+        series = self._values.get(label_values)
+        if series is None:
+            # per-bucket counts followed by the running sum
+            series = self._values[label_values] = [0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self):
+        for label_values, series in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, f'le="{bound}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, label_values)} {series[-1]}"
+            yield f"{self.name}_count{_format_labels(self.labels, label_values)} {cumulative}"
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+HANDLER_LATENCY = Histogram("bot_handler_seconds", "Handler latency", ("handler", "state"))
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Exceptions escaping handlers", ("handler",))
+TELEGRAM_LATENCY = Histogram("telegram_request_seconds", "Bot API request latency", ("method",))
+TELEGRAM_WAIT = Histogram("telegram_rate_limit_wait_seconds", "Time spent waiting for the outbound rate limiter")
+TELEGRAM_RETRIES = Counter("telegram_retry_after_total", "Bot API requests rejected with 429", ("method",))
+OPENAI_LATENCY = Histogram("openai_request_seconds", "OpenAI request latency", ("kind",))
+OPENAI_FIRST_TOKEN = Histogram("openai_first_token_seconds", "Time to the first streamed token")
+OPENAI_TOKENS = Counter("openai_tokens_total", "Tokens reported by OpenAI", ("type",))
+OPENAI_PROMPT_TOKENS = Counter("openai_prompt_tokens_estimated_total",
+                               "Estimated prompt tokens in the shared system prefix and in the per-request suffix",
+                               ("part",))
+OPENAI_COALESCED = Counter("openai_coalesced_total", "Requests that joined an identical call already in flight")
+OPENAI_QUEUE_DEPTH = Gauge("openai_queue_depth", "Requests waiting in the OpenAI governor queue")
+OPENAI_IN_FLIGHT = Gauge("openai_in_flight", "OpenAI requests in flight")
+CACHE_HITS = Gauge("response_cache_hits", "Response cache hits")
+CACHE_MISSES = Gauge("response_cache_misses", "Response cache misses")
+INTENT_MATCHES = Counter("intent_matches_total", "Free-text messages routed by the intent classifier", ("intent",))
+FACT_POOL_SIZE = Gauge("fact_pool_size", "Pre-generated facts ready to serve")
+STARTUP_SECONDS = Gauge("bot_startup_seconds", "Time spent in each startup stage", ("stage",))
+EVENT_LOOP_LAG = Histogram("event_loop_lag_seconds", "Delay of the event loop beyond the expected wake-up",
+                           buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1))
+
+
+def record_span(name: str, seconds: float) -> None:
+    spans = _trace.get()
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+def track_handler(callback, by_state: bool = False):
+    """Wrap a handler callback to record its latency (per conversation_state if ``by_state``)."""
+    name = callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        state = ""
+        if by_state and context.user_data is not None:
+            state = context.user_data.get("conversation_state") or "none"
+        token = _trace.set([]) if tracing_enabled else None
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            HANDLER_ERRORS.inc(1, name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            HANDLER_LATENCY.observe(elapsed, name, state)
+            if token is not None:
+                spans = " ".join(f"{span}={seconds * 1000:.1f}ms" for span, seconds in _trace.get())
+                logger.info(f"trace update={update.update_id} handler={name} state={state} "
+                            f"total={elapsed * 1000:.1f}ms {spans}")
+                _trace.reset(token)
+
+    return wrapper
+
+
+class StartupProfile:
+    """Times consecutive startup stages, exports them as bot_startup_seconds and formats a one-line report.
+
+    Per-module import times are available with ``python -X importtime src/bot.py``.
+    """
+
+    def __init__(self, **stages: float):
+        self.stages = {}
+        for stage, seconds in stages.items():
+            self._record(stage, seconds)
+        self._last = time.perf_counter()
+
+    def _record(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = seconds
+        STARTUP_SECONDS.set(seconds, stage)
+
+    def mark(self, stage: str) -> float:
+        now = time.perf_counter()
+        seconds = now - self._last
+        self._last = now
+        self._record(stage, seconds)
+        return seconds
+
+    def report(self) -> str:
+        stages = ", ".join(f"{stage} {seconds * 1000:.0f} мс" for stage, seconds in self.stages.items())
+        return f"Запуск за {sum(self.stages.values()) * 1000:.0f} мс: {stages}"
+
+
+async def monitor_event_loop(interval: float = 0.5) -> None:
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - started - interval))
+
+
+async def handle_http(method: str, path: str, headers: dict, body: bytes):
+    if method == "GET" and path.split("?")[0] == "/metrics":
+        return 200, "text/plain; version=0.0.4; charset=utf-8", render().encode("utf-8")
+    return 404, "text/plain", b""
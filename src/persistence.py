@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import zlib
+
+from telegram import Update
+from telegram.ext import BasePersistence, ContextTypes, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+# Payloads larger than this are zlib-compressed before they are written
+COMPRESS_THRESHOLD = 256
+
+
+def encode(data: dict) -> bytes:
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(payload) > COMPRESS_THRESHOLD:
+        return b"z" + zlib.compress(payload)
+    return b"j" + payload
+
+
+def digest(payload: bytes) -> bytes:
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+def decode(payload: bytes) -> dict:
+    if payload[:1] == b"z":
+        return json.loads(zlib.decompress(payload[1:]))
+    return json.loads(payload[1:])
+
+
+class SQLitePersistence(BasePersistence):
+    """Stores user_data and chat_data in SQLite, one compact row per user or chat.
+
+    Nothing is read at startup. load_session() loads a user's and chat's rows the
+    first time an update from them arrives. PTB hands over changed entries every
+    ``update_interval`` seconds. Only entries whose encoded form actually changed
+    are queued, and the queue is written in one transaction off the event loop.
+    """
+
+    def __init__(self, path: str, update_interval: float = 5):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=True, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.path = path
+        self._db = None
+        self._lock = threading.Lock()
+        # Digests of what is stored per row, so unchanged data is never rewritten
+        self._written = {}
+        self._pending = {}
+        self._loading = {}
+        self._flush_task = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.executescript(
+                "PRAGMA journal_mode=WAL;"
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " kind TEXT NOT NULL, id INTEGER NOT NULL, data BLOB NOT NULL, PRIMARY KEY (kind, id)"
+                ") WITHOUT ROWID;"
+            )
+        return self._db
+
+    def _read(self, kind: str, key: int):
+        with self._lock:
+            return self._connection().execute(
+                "SELECT data FROM sessions WHERE kind = ? AND id = ?", (kind, key)
+            ).fetchone()
+
+    def _write(self, pending: dict) -> None:
+        with self._lock:
+            db = self._connection()
+            with db:
+                for (kind, key), payload in pending.items():
+                    if payload is None:
+                        db.execute("DELETE FROM sessions WHERE kind = ? AND id = ?", (kind, key))
+                    else:
+                        db.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)", (kind, key, payload))
+
+    async def _load(self, kind: str, key: int, target: dict) -> None:
+        state = self._loading.get((kind, key))
+        if state is True:
+            return
+        if state is not None:
+            await asyncio.shield(state)
+            return
+        task = asyncio.ensure_future(asyncio.to_thread(self._read, kind, key))
+        self._loading[(kind, key)] = task
+        try:
+            row = await asyncio.shield(task)
+        except Exception:
+            del self._loading[(kind, key)]
+            raise
+        self._loading[(kind, key)] = True
+        if row is not None:
+            self._written[(kind, key)] = digest(row[0])
+            # Fields set before the row arrived win over the stored ones
+            for field, value in decode(row[0]).items():
+                target.setdefault(field, value)
+
+    async def load_session(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Pre-handler that lazily pulls the sender's user_data and chat_data from the database."""
+        if update.effective_user is not None:
+            await self._load("user", update.effective_user.id, context.user_data)
+        if update.effective_chat is not None:
+            await self._load("chat", update.effective_chat.id, context.chat_data)
+
+    def _queue(self, kind: str, key: int, data) -> None:
+        if data is None:
+            payload = None
+        else:
+            try:
+                payload = encode(data)
+            except (TypeError, ValueError) as e:
+                logger.error(f"Не вдалося зберегти {kind} {key}: {e}")
+                return
+        payload_digest = digest(payload) if payload is not None else None
+        if (kind, key) in self._written and self._written[(kind, key)] == payload_digest:
+            return
+        self._written[(kind, key)] = payload_digest
+        self._pending[(kind, key)] = payload
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_pending())
+
+    async def _flush_pending(self) -> None:
+        while self._pending:
+            pending, self._pending = self._pending, {}
+            try:
+                await asyncio.to_thread(self._write, pending)
+            except sqlite3.Error as e:
+                logger.error(f"Помилка запису сесій у {self.path}: {e}")
+                for key in pending:
+                    self._written.pop(key, None)
+
+    async def get_user_data(self) -> dict:
+        return {}
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        return {}
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._queue("user", user_id, data)
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        self._queue("chat", chat_id, data)
+
+    async def update_bot_data(self, data) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        pass
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._loading.pop(("user", user_id), None)
+        self._queue("user", user_id, None)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._loading.pop(("chat", chat_id), None)
+        self._queue("chat", chat_id, None)
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data) -> None:
+        pass
+
+    async def flush(self) -> None:
+        if self._flush_task is not None:
+            await self._flush_task
+        await self._flush_pending()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,41 @@
+import sys
+from functools import lru_cache
+
+from tokens import count_message_tokens
+
+# Providers cache prompt prefixes only on an exact byte match, so every request
+# built from the same persona, mode or language must start with the very same
+# system message. Variable parts (category, genre, exclusions, target languages)
+# belong in the user messages after it.
+
+MAX_INTERNED = 256
+
+_interned = {}
+
+
+def system_message(text: str) -> dict:
+    """The shared, never-mutated system message dict for ``text``."""
+    text = sys.intern(text.strip())
+    message = _interned.get(text)
+    if message is None:
+        if len(_interned) >= MAX_INTERNED:
+            # Only hot-reloaded prompt edits can get here; start over rather than grow without bound
+            _interned.clear()
+        message = _interned[text] = {"role": "system", "content": text}
+    return message
+
+
+@lru_cache(maxsize=MAX_INTERNED)
+def system_tokens(text: str) -> int:
+    return count_message_tokens(text)
+
+
+def split_prompt_tokens(message_list: list) -> tuple:
+    """Tokens in the leading system messages (the cacheable prefix) and in everything after them."""
+    prefix = 0
+    index = 0
+    while index < len(message_list) and message_list[index]["role"] == "system":
+        prefix += system_tokens(message_list[index]["content"])
+        index += 1
+    suffix = sum(count_message_tokens(message["content"]) for message in message_list[index:])
+    return prefix, suffix
@@ -0,0 +1,151 @@
+import asyncio
+import contextlib
+import logging
+import time
+from typing import Any, Callable, Coroutine, Optional, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Methods that count towards Telegram's flood limits. Everything else (getUpdates, answerCallbackQuery,
+# deleteMessage, setMyCommands, ...) is sent straight away.
+LIMITED_ENDPOINTS = frozenset({
+    "sendMessage", "sendPhoto", "sendDocument", "sendMediaGroup", "sendChatAction",
+    "editMessageText", "editMessageCaption", "editMessageReplyMarkup", "copyMessage", "forwardMessage",
+})
+EDIT_ENDPOINTS = frozenset({"editMessageText", "editMessageCaption", "editMessageReplyMarkup"})
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float = 1) -> float:
+        """Take ``amount`` tokens and return how long to wait before using them.
+
+        Tokens may go negative, which queues callers in arrival order without a lock.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def block(self, seconds: float) -> None:
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+    def idle(self) -> bool:
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.capacity
+
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    retry_after = error.retry_after
+    return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+
+
+class OutboundRateLimiter(BaseRateLimiter[int]):
+    """Schedules outgoing Bot API calls with a global and a per-chat token bucket.
+
+    Edits of a message that has a newer edit queued behind it are dropped, since the
+    newer edit overwrites them anyway. A 429 reply blocks the affected bucket for
+    ``retry_after`` seconds before the request is retried.
+    """
+
+    def __init__(self, overall_rate: float = 30, chat_rate: float = 1, chat_burst: float = 3,
+                 group_rate: float = 20 / 60, max_retries: int = 3, max_chats: int = 10000):
+        self.overall = TokenBucket(overall_rate, overall_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self._chats = {}
+        self._latest_edit = {}
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        self._chats.clear()
+        self._latest_edit.clear()
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.max_chats:
+                self._chats = {key: value for key, value in self._chats.items() if not value.idle()}
+            if (isinstance(chat_id, int) and chat_id < 0) or isinstance(chat_id, str):
+                bucket = TokenBucket(self.group_rate, 1)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    @staticmethod
+    async def _timed(endpoint: str, callback, args, kwargs):
+        started = time.perf_counter()
+        try:
+            return await callback(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.TELEGRAM_LATENCY.observe(elapsed, endpoint)
+            metrics.record_span(f"telegram.{endpoint}", elapsed)
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, dict, list]]],
+        args: Any,
+        kwargs: dict,
+        endpoint: str,
+        data: dict,
+        rate_limit_args: Optional[int],
+    ) -> Union[bool, dict, list]:
+        if endpoint not in LIMITED_ENDPOINTS:
+            if endpoint == "getUpdates":
+                return await callback(*args, **kwargs)
+            return await self._timed(endpoint, callback, args, kwargs)
+
+        max_retries = rate_limit_args if rate_limit_args is not None else self.max_retries
+        chat_id = data.get("chat_id")
+        with contextlib.suppress(ValueError, TypeError):
+            chat_id = int(chat_id)
+        chat_bucket = self._chat_bucket(chat_id) if chat_id is not None else None
+
+        edit_key = None
+        if endpoint in EDIT_ENDPOINTS and data.get("message_id") is not None:
+            edit_key = (endpoint, chat_id, data["message_id"])
+            token = object()
+            self._latest_edit[edit_key] = token
+
+        try:
+            for attempt in range(max_retries + 1):
+                delay = self.overall.reserve()
+                if chat_bucket is not None:
+                    delay = max(delay, chat_bucket.reserve())
+                metrics.TELEGRAM_WAIT.observe(delay)
+                if delay:
+                    await asyncio.sleep(delay)
+                if edit_key is not None and self._latest_edit.get(edit_key) is not token:
+                    # A newer edit of the same message is queued; Telegram treats a skipped edit as success
+                    return True
+                try:
+                    return await self._timed(endpoint, callback, args, kwargs)
+                except RetryAfter as e:
+                    metrics.TELEGRAM_RETRIES.inc(1, endpoint)
+                    if attempt == max_retries:
+                        raise
+                    seconds = retry_after_seconds(e) + 0.1
+                    logger.info(f"Telegram flood limit на {endpoint}, повтор через {seconds:.1f} с")
+                    (chat_bucket or self.overall).block(seconds)
+        finally:
+            if edit_key is not None and self._latest_edit.get(edit_key) is token:
+                del self._latest_edit[edit_key]
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+from typing import Callable, Optional
+
+from facts import fingerprint, split_items
+from governor import Priority
+from gpt import ChatGPTService, parse_json_answer
+from prompts import system_message
+
+logger = logging.getLogger(__name__)
+
+
+def _item(title: str, description: str) -> Optional[dict]:
+    title = title.replace("📌", "").strip(" *_\"'")
+    if not title:
+        return None
+    return {"title": title, "description": " ".join(description.split())}
+
+
+def parse_recommendations(text: str) -> list:
+    """Ranked ``{"title", "description"}`` items from a JSON answer, or from numbered/paragraph text as a fallback."""
+    data = parse_json_answer(text)
+    if isinstance(data, dict):
+        data = data.get("items")
+    if isinstance(data, list):
+        items = (
+            _item(str(entry.get("title", "")), str(entry.get("description", "")))
+            for entry in data if isinstance(entry, dict)
+        )
+    else:
+        items = (_item(*(part.split("\n", 1) + [""])[:2]) for part in split_items(text))
+    return [item for item in items if item is not None]
+
+
+class Recommender:
+    """Per-session queues of ranked recommendations, fetched several at a time.
+
+    The queue and the titles already shown live in ``user_data`` under ``rec_queue``
+    and ``rec_shown``. A dislike pops the next queued item without calling the API.
+    When fewer than ``low_water`` items are left a refill runs in the background.
+    The model is told to skip at most ``max_excluded`` recent titles, so the prompt
+    size stays bounded.
+    """
+
+    def __init__(self, chatgpt_service: ChatGPTService, load_prompt: Callable[[], str], batch_size: int = 5,
+                 low_water: int = 2, max_excluded: int = 30):
+        self.chatgpt_service = chatgpt_service
+        self.load_prompt = load_prompt
+        self.batch_size = batch_size
+        self.low_water = low_water
+        self.max_excluded = max_excluded
+        self._refills = {}
+
+    def reset(self, user_data: dict, category: str, genre: str) -> None:
+        user_data["rec_category"] = category
+        user_data["rec_genre"] = genre
+        user_data["rec_queue"] = []
+        user_data["rec_shown"] = []
+
+    def _system(self) -> dict:
+        return system_message(
+            f"{self.load_prompt()}\n\n"
+            f"Давай {self.batch_size} різних рекомендацій, від найкращої до менш очевидної. Для кожної дай назву "
+            f"і короткий опис (2-3 речення) чому це круто. "
+            f'Відповідай JSON-об\'єктом {{"items": [{{"title": "...", "description": "..."}}]}}.'
+        )
+
+    async def _fetch(self, category: str, genre: str, shown: list, priority: Priority, user_id) -> list:
+        excluded = "; ".join(shown[-self.max_excluded:])
+        request = f'Категорія: "{category}". Жанр: "{genre}".'
+        if excluded:
+            request += f"\nНЕ рекомендуй: {excluded}"
+        response = await self.chatgpt_service.send_message_list([
+            self._system(),
+            {"role": "user", "content": request},
+        ], priority=priority, user_id=user_id, json_mode=True)
+        return parse_recommendations(response or "")
+
+    async def _refill(self, user_data: dict, priority: Priority, user_id) -> None:
+        category, genre = user_data.get("rec_category"), user_data.get("rec_genre")
+        items = await self._fetch(category, genre, user_data.get("rec_shown", []), priority, user_id)
+        # The user may have started a new search while the completion was in flight
+        if (user_data.get("rec_category"), user_data.get("rec_genre")) != (category, genre):
+            return
+        seen = {fingerprint(title) for title in user_data.get("rec_shown", [])}
+        queue = user_data.setdefault("rec_queue", [])
+        seen.update(fingerprint(item["title"]) for item in queue)
+        for item in items:
+            key = fingerprint(item["title"])
+            if key and key not in seen:
+                seen.add(key)
+                queue.append(item)
+
+    def _start_refill(self, user_data: dict, priority: Priority, user_id) -> asyncio.Task:
+        # Keyed by the search too: a refill still running for the previous search would add nothing to this one
+        key = (user_id, user_data.get("rec_category"), user_data.get("rec_genre"))
+        task = self._refills.get(key)
+        if task is None or task.done():
+            task = asyncio.get_running_loop().create_task(self._refill(user_data, priority, user_id))
+            task.add_done_callback(self._refill_done)
+            self._refills[key] = task
+        return task
+
+    def _refill_done(self, task: asyncio.Task) -> None:
+        for key, running in list(self._refills.items()):
+            if running is task:
+                del self._refills[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Помилка при поповненні черги рекомендацій: {task.exception()}")
+
+    def has_next(self, user_data: dict) -> bool:
+        return bool(user_data.get("rec_queue"))
+
+    async def next(self, user_data: dict, user_id) -> Optional[dict]:
+        """Pop the next recommendation, fetching a batch first only when the queue is empty."""
+        if not user_data.get("rec_queue"):
+            task = self._start_refill(user_data, Priority.INTERACTIVE, user_id)
+            # The user is now waiting on a refill that may have been started in the background
+            self.chatgpt_service.governor.promote(user_id, Priority.INTERACTIVE)
+            # Shielded so that a cancelled handler does not throw away a batch another press will want
+            await asyncio.shield(task)
+        queue = user_data.get("rec_queue")
+        if not queue:
+            return None
+        item = queue.pop(0)
+        shown = user_data.setdefault("rec_shown", [])
+        shown.append(item["title"])
+        del shown[:-self.max_excluded]
+        if len(queue) < self.low_water:
+            self._start_refill(user_data, Priority.BACKGROUND, user_id)
+        return item
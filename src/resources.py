@@ -0,0 +1,72 @@
+import asyncio
+import logging
+import os
+from types import MappingProxyType
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceRegistry:
+    """Immutable in-memory index of the text resources (prompts, messages).
+
+    All files are read once by load(); lookups never touch the disk. reload_if_changed()
+    rebuilds the index and swaps it in one assignment, so readers always see a
+    consistent snapshot.
+    """
+
+    def __init__(self, base_dir: str, kinds: tuple = ("prompts", "messages")):
+        self.base_dir = base_dir
+        self.kinds = kinds
+        self._index = None
+        self._mtimes = None
+
+    def _scan(self) -> dict:
+        mtimes = {}
+        for kind in self.kinds:
+            kind_dir = os.path.join(self.base_dir, kind)
+            for file_name in os.listdir(kind_dir):
+                if file_name.endswith(".txt"):
+                    file_path = os.path.join(kind_dir, file_name)
+                    mtimes[file_path] = os.stat(file_path).st_mtime_ns
+        return mtimes
+
+    def load(self) -> None:
+        mtimes = self._scan()
+        index = {kind: {} for kind in self.kinds}
+        for file_path in mtimes:
+            kind = os.path.basename(os.path.dirname(file_path))
+            name = os.path.splitext(os.path.basename(file_path))[0]
+            with open(file_path, "r", encoding="utf-8") as file:
+                index[kind][name] = file.read()
+        self._index = MappingProxyType({kind: MappingProxyType(items) for kind, items in index.items()})
+        self._mtimes = mtimes
+
+    def get(self, kind: str, name: str) -> str:
+        if self._index is None:
+            self.load()
+        try:
+            return self._index[kind][name]
+        except KeyError:
+            raise KeyError(f"Невідомий ресурс {kind}/{name}") from None
+
+    def require(self, kind: str, names) -> None:
+        if self._index is None:
+            self.load()
+        missing = [name for name in names if name not in self._index.get(kind, {})]
+        if missing:
+            raise KeyError(f"Відсутні ресурси {kind}: {', '.join(missing)}")
+
+    def reload_if_changed(self) -> bool:
+        if self._scan() == self._mtimes:
+            return False
+        self.load()
+        return True
+
+    async def watch(self, interval: float = 2.0) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await asyncio.to_thread(self.reload_if_changed):
+                    logger.info("Ресурси перезавантажено")
+            except Exception as e:
+                logger.error(f"Помилка при перезавантаженні ресурсів: {e}")
@@ -0,0 +1,88 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable
+
+import metrics
+
+
+class _Flight:
+    __slots__ = ("task", "waiters", "parts", "updated")
+
+    def __init__(self):
+        self.task = None
+        self.waiters = 0
+        self.parts = []
+        self.updated = asyncio.Event()
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time and shares its result with every caller asking meanwhile.
+
+    The call runs in its own task, so cancelling one caller does not abort it for
+    the others. It is cancelled only when every caller waiting on it has gone.
+    Everything runs on the event loop thread, so the bookkeeping needs no lock.
+    """
+
+    def __init__(self):
+        self._flights = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def _join(self, key, start: Callable[[_Flight], Awaitable]) -> _Flight:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.get_running_loop().create_task(start(flight))
+            flight.task.add_done_callback(lambda task: self._land(key, flight))
+        else:
+            metrics.OPENAI_COALESCED.inc()
+        flight.waiters += 1
+        return flight
+
+    def _land(self, key, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        flight.updated.set()
+        if not flight.task.cancelled():
+            # Mark the exception as retrieved; every waiter re-raises it on its own
+            flight.task.exception()
+
+    def _leave(self, key, flight: _Flight) -> None:
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            flight.task.cancel()
+            # A caller arriving while the cancellation lands must start a fresh call
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    async def call(self, key, factory: Callable[[], Awaitable]):
+        async def start(flight):
+            return await factory()
+
+        flight = self._join(key, start)
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            self._leave(key, flight)
+
+    async def stream(self, key, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """Like ``call`` for a stream: callers that join late first get the chunks they missed."""
+        async def start(flight):
+            async for part in factory():
+                flight.parts.append(part)
+                updated, flight.updated = flight.updated, asyncio.Event()
+                updated.set()
+
+        flight = self._join(key, start)
+        try:
+            index = 0
+            while True:
+                while index < len(flight.parts):
+                    yield flight.parts[index]
+                    index += 1
+                if flight.task.done():
+                    flight.task.result()
+                    return
+                await flight.updated.wait()
+        finally:
+            self._leave(key, flight)
@@ -0,0 +1,125 @@
+from telegram.constants import MessageLimit
+
+# Room left in every piece for the markers MarkdownBalancer adds when it closes
+# and reopens an entity (a code fence header with its language, at most).
+MARKUP_RESERVE = 64
+
+FENCE = "```"
+
+_SEPARATORS = ("\n\n", "\n", ". ", "! ", "? ", "; ", ", ", " ")
+
+
+def find_split(text: str, limit: int) -> int:
+    """Index to cut ``text`` at so the head fits in ``limit``: a paragraph, line, sentence or word boundary.
+
+    A code block that starts in the second half of the window is moved whole to
+    the next piece instead of being cut.
+    """
+    if len(text) <= limit:
+        return len(text)
+    window = text[:limit]
+    fences = []
+    start = 0
+    while (start := window.find(FENCE, start)) != -1:
+        fences.append(start)
+        start += len(FENCE)
+    if len(fences) % 2 and fences[-1] > limit // 2:
+        return fences[-1]
+    for separator in _SEPARATORS:
+        index = window.rfind(separator)
+        if index > limit // 2:
+            return index + len(separator)
+    return limit
+
+
+def _open_entities(text: str) -> list:
+    """Entities (legacy Markdown) still open at the end of ``text``, as ``(marker, index)`` of what opened them."""
+    opened = []
+    i = 0
+    while i < len(text):
+        if opened and opened[-1][0].startswith(FENCE):
+            if text.startswith(FENCE, i):
+                opened.pop()
+                i += len(FENCE)
+            else:
+                i += 1
+            continue
+        char = text[i]
+        if opened and opened[-1][0] == "`":
+            if char == "`":
+                opened.pop()
+            i += 1
+            continue
+        if char == "\\":
+            i += 2
+            continue
+        if text.startswith(FENCE, i):
+            end = text.find("\n", i)
+            header = text[i:] if end == -1 else text[i:end + 1]
+            opened.append((header if header.endswith("\n") else header + "\n", i))
+            i += len(header)
+            continue
+        if char in "*_`":
+            # Legacy Markdown entities do not nest, so only the innermost can close
+            if opened and opened[-1][0] == char:
+                opened.pop()
+            elif not opened:
+                opened.append((char, i))
+        i += 1
+    return opened
+
+
+class MarkdownBalancer:
+    """Closes entities cut by a split at the end of a piece and reopens them at the start of the next one.
+
+    Markers still open when the whole reply ends were never meant as markup (``5 * 3``,
+    a lone ``_``), so the final piece escapes them instead of closing them. An unclosed
+    code block is left as is; Telegram rejects it and the plain-text fallback applies.
+    """
+
+    def __init__(self):
+        self.reopen = ""
+
+    def render(self, piece: str, final: bool = False) -> str:
+        text = self.reopen + piece
+        opened = _open_entities(text)
+        if final:
+            self.reopen = ""
+            # Escaping one marker can turn a later one into an opener, so scan again until none is left
+            while opened and not opened[-1][0].startswith(FENCE):
+                _, index = opened[0]
+                text = text[:index] + "\\" + text[index:]
+                opened = _open_entities(text)
+            return text
+        closing = ""
+        for marker, _ in reversed(opened):
+            if marker.startswith(FENCE):
+                closing += FENCE if text.endswith("\n") else "\n" + FENCE
+            else:
+                closing += marker
+        self.reopen = "".join(marker for marker, _ in opened)
+        return text + closing
+
+
+class StreamSplitter:
+    """Cuts a growing stream of text into message-sized pieces as soon as each one is complete."""
+
+    def __init__(self, limit: int = MessageLimit.MAX_TEXT_LENGTH - MARKUP_RESERVE):
+        self.limit = limit
+        self.buffer = ""
+
+    def feed(self, chunk: str) -> list:
+        self.buffer += chunk
+        pieces = []
+        while len(self.buffer) > self.limit:
+            cut = find_split(self.buffer, self.limit)
+            pieces.append(self.buffer[:cut].rstrip())
+            self.buffer = self.buffer[cut:].lstrip("\n")
+        return pieces
+
+
+def split_text(text: str, limit: int = MessageLimit.MAX_TEXT_LENGTH - MARKUP_RESERVE) -> list:
+    splitter = StreamSplitter(limit)
+    pieces = splitter.feed(text)
+    pieces.append(splitter.buffer)
+    return pieces
@@ -0,0 +1,41 @@
+from telegram import Update
+from telegram.ext import ContextTypes
+
+
+class StateHandler:
+    """Handles free-text messages while a chat is in one conversation state.
+
+    Subclasses set ``state`` and do their expensive setup (keyboards, prompt
+    templates, lookup tables) in ``__init__``. That setup runs once at
+    registration, not on every message.
+    """
+
+    state: str = None
+
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE, message_text: str) -> None:
+        raise NotImplementedError
+
+
+class StateRouter:
+    """Maps ``context.user_data["conversation_state"]`` to its StateHandler with one dict lookup.
+
+    Chats without a state go to ``fallback``. States with no registered
+    handler (e.g. waiting for a button press) ignore free text.
+    """
+
+    def __init__(self):
+        self._handlers = {}
+        self.fallback: StateHandler = None
+
+    def register(self, handler: StateHandler) -> StateHandler:
+        if handler.state is None:
+            self.fallback = handler
+        else:
+            self._handlers[handler.state] = handler
+        return handler
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        state = context.user_data.get("conversation_state")
+        handler = self._handlers.get(state) if state else self.fallback
+        if handler is not None:
+            await handler.handle(update, context, update.message.text)
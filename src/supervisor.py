@@ -0,0 +1,202 @@
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+
+import httpx
+
+from config import Config
+from http_server import start_http_server
+
+logger = logging.getLogger(__name__)
+
+BOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot.py")
+
+
+class HashRing:
+    """Consistent hash ring, so resizing the pool only moves a small share of the chats."""
+
+    def __init__(self, nodes: list, replicas: int = 100):
+        self._ring = sorted(
+            (self._hash(f"{node}:{replica}"), node)
+            for node in nodes
+            for replica in range(replicas)
+        )
+        self._keys = [key for key, _ in self._ring]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+    def node_for(self, key) -> int:
+        index = bisect.bisect(self._keys, self._hash(str(key))) % len(self._ring)
+        return self._ring[index][1]
+
+
+def chat_id_of(update: dict):
+    for field in ("message", "edited_message", "channel_post", "callback_query", "my_chat_member", "chat_member"):
+        payload = update.get(field)
+        if not payload:
+            continue
+        chat = payload.get("chat") or (payload.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+        if payload.get("from"):
+            return payload["from"]["id"]
+    return update.get("update_id", 0)
+
+
+class Worker:
+    def __init__(self, index: int, config: Config):
+        self.index = index
+        self.config = config
+        self.port = config.shard_base_port + index
+        self.url = f"http://127.0.0.1:{self.port}/{config.webhook_path}"
+        self.process = None
+        self.queue = asyncio.Queue()
+        self.failed_checks = 0
+
+    def start(self) -> None:
+        config, workers = self.config, self.config.shard_workers
+        env = dict(
+            os.environ,
+            BOT_MODE="webhook",
+            WEBHOOK_LISTEN="127.0.0.1",
+            WEBHOOK_PORT=str(self.port),
+            # Restarting a worker must not throw away updates Telegram is holding for the others
+            DROP_PENDING_UPDATES="false",
+            # Each worker exposes its own /metrics endpoint next to the configured port
+            METRICS_PORT=str(config.metrics_port + 1 + self.index) if config.metrics_port else "0",
+            # Global limits are shared by the whole pool, so every worker gets its share of them
+            TELEGRAM_GLOBAL_RATE=str(config.telegram_global_rate / workers),
+            OPENAI_RPM=str(config.openai_rpm / workers),
+            OPENAI_TPM=str(config.openai_tpm / workers),
+            OPENAI_MAX_IN_FLIGHT=str(max(1, config.openai_max_in_flight // workers)),
+        )
+        self.process = subprocess.Popen([sys.executable, BOT_SCRIPT], env=env)
+        self.failed_checks = 0
+        logger.info(f"Воркер {self.index} запущено (pid {self.process.pid}, порт {self.port})")
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    def restart(self) -> None:
+        self.stop()
+        self.start()
+
+    async def healthy(self) -> bool:
+        if self.process is None or self.process.poll() is not None:
+            return False
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", self.port), 2)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        return True
+
+
+class Supervisor:
+    """Runs N bot workers and routes every update to one of them by chat ID.
+
+    Updates for a chat always go to the same worker, in the order they arrived,
+    through that worker's FIFO queue; the worker then handles a chat's updates one
+    at a time. Telegram's global flood limit and the OpenAI limits are split evenly
+    between the workers. Dead or unreachable workers are restarted.
+    """
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.workers = [Worker(index, config) for index in range(config.shard_workers)]
+        self.ring = HashRing(list(range(config.shard_workers)))
+        self.client = httpx.AsyncClient(timeout=10)
+
+    async def handle(self, method: str, path: str, headers: dict, body: bytes):
+        if path.split("?")[0].strip("/") != self.config.webhook_path.strip("/"):
+            return 404, "text/plain", b""
+        if method != "POST":
+            return 405, "text/plain", b""
+        secret = self.config.webhook_secret
+        if secret and headers.get("x-telegram-bot-api-secret-token") != secret:
+            return 403, "text/plain", b""
+        try:
+            update = json.loads(body)
+        except ValueError:
+            return 400, "text/plain", b""
+        worker = self.workers[self.ring.node_for(chat_id_of(update))]
+        worker.queue.put_nowait(body)
+        return 200, "text/plain", b""
+
+    async def forward(self, worker: Worker) -> None:
+        headers = {"Content-Type": "application/json"}
+        if self.config.webhook_secret:
+            headers["X-Telegram-Bot-Api-Secret-Token"] = self.config.webhook_secret
+        while True:
+            body = await worker.queue.get()
+            for attempt in range(10):
+                try:
+                    response = await self.client.post(worker.url, content=body, headers=headers)
+                    if response.status_code < 500:
+                        break
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(min(2 ** attempt * 0.1, 5))
+            else:
+                logger.error(f"Воркер {worker.index} не прийняв оновлення, його відкинуто")
+
+    async def watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.shard_health_interval)
+            for worker in self.workers:
+                if await worker.healthy():
+                    worker.failed_checks = 0
+                    continue
+                worker.failed_checks += 1
+                if worker.process.poll() is not None or worker.failed_checks >= 3:
+                    logger.warning(f"Воркер {worker.index} не відповідає, перезапуск")
+                    await asyncio.to_thread(worker.restart)
+
+    async def run(self) -> None:
+        for worker in self.workers:
+            worker.start()
+        listen, port, path = self.config.webhook_listen, self.config.webhook_port, self.config.webhook_path
+        server = await start_http_server(self.handle, listen, port)
+        tasks = [asyncio.create_task(self.forward(worker)) for worker in self.workers]
+        tasks.append(asyncio.create_task(self.watch()))
+        logger.info(f"Супервізор слухає {listen}:{port}/{path}, воркерів: {len(self.workers)}")
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        try:
+            await stop.wait()
+        finally:
+            server.close()
+            for task in tasks:
+                task.cancel()
+            for worker in self.workers:
+                await asyncio.to_thread(worker.stop)
+            await self.client.aclose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    supervisor_config = Config.from_env()
+    if not supervisor_config.webhook_url:
+        # Workers would register their local address as the webhook, fail and be restarted forever
+        logger.error("WEBHOOK_URL не задано: супервізор працює лише з публічною адресою вебхука")
+        sys.exit(1)
+    asyncio.run(Supervisor(supervisor_config).run())
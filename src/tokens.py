@@ -0,0 +1,25 @@
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Every chat message costs a few extra tokens for the role and separators
+MESSAGE_OVERHEAD = 4
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    global _encoding
+    if not text:
+        return 0
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        return len(_encoding.encode(text))
+    # Without tiktoken, UTF-8 bytes / 4 is a close enough estimate for both Latin and Cyrillic text
+    return max(1, len(text.encode("utf-8")) // 4)
+
+
+def count_message_tokens(text: str) -> int:
+    return count_tokens(text) + MESSAGE_OVERHEAD
@@ -0,0 +1,81 @@
+import logging
+from typing import AsyncIterator, Optional
+
+from gpt import ChatGPTService, parse_json_answer
+from governor import Priority
+from prompts import system_message
+
+logger = logging.getLogger(__name__)
+
+
+def parse_batch(answer: Optional[str], codes) -> dict:
+    """Pull ``{code: translation}`` for the requested codes out of a JSON answer, ignoring anything else."""
+    data = parse_json_answer(answer)
+    if not isinstance(data, dict):
+        return {}
+    return {code: data[code].strip() for code in codes if isinstance(data.get(code), str) and data[code].strip()}
+
+
+class Translator:
+    """Single and batch translations that share one set of cache entries.
+
+    A batch answer is split per language and stored under the same keys a single
+    translation would use, so switching languages afterwards never calls the API.
+    """
+
+    def __init__(self, chatgpt_service: ChatGPTService, languages: dict, cache_ttl: float):
+        self.chatgpt_service = chatgpt_service
+        self.languages = languages
+        self.cache_ttl = cache_ttl
+        self.prompts = {
+            code: f"You are a professional translator. Translate the following text to {name}. "
+                  f"Provide only the translation without any additional comments."
+            for code, name in languages.items()
+        }
+        # The target list changes with the cache state, so it goes in a user message after this fixed prefix
+        self.batch_prompt = system_message(
+            "You are a professional translator. The first user message lists target languages as code: name; "
+            "the second one is the text. Translate the text to each target language. Reply with a single JSON "
+            "object whose keys are exactly the listed language codes and whose values are the translations. "
+            "Provide only the JSON without any additional comments."
+        )
+
+    async def cached(self, code: str, text: str) -> Optional[str]:
+        return await self.chatgpt_service.cached_answer(self.prompts[code], text, temperature=0)
+
+    def stream(self, code: str, text: str, user_id=None) -> AsyncIterator[str]:
+        return self.chatgpt_service.stream_question(
+            prompt_text=self.prompts[code],
+            message_text=text,
+            temperature=0,
+            cache_ttl=self.cache_ttl,
+            priority=Priority.TRANSLATION,
+            user_id=user_id
+        )
+
+    async def translate_all(self, text: str, codes=None, user_id=None) -> dict:
+        codes = tuple(self.languages if codes is None else codes)
+        translations = {code: await self.cached(code, text) for code in codes}
+        missing = [code for code in codes if translations[code] is None]
+        if len(missing) > 1:
+            answer = await self.chatgpt_service.send_message_list([
+                self.batch_prompt,
+                {"role": "user", "content": "; ".join(f"{code}: {self.languages[code]}" for code in missing)},
+                {"role": "user", "content": text},
+            ], temperature=0, priority=Priority.TRANSLATION, user_id=user_id, json_mode=True)
+            for code, translation in parse_batch(answer, missing).items():
+                translations[code] = translation
+                self.chatgpt_service.cache_answer(self.prompts[code], text, translation, self.cache_ttl, temperature=0)
+            missing = [code for code in missing if translations[code] is None]
+            if missing:
+                logger.warning(f"Пакетний переклад не містить мов: {', '.join(missing)}")
+        for code in missing:
+            translations[code] = await self.chatgpt_service.send_question(
+                prompt_text=self.prompts[code],
+                message_text=text,
+                temperature=0,
+                cache_ttl=self.cache_ttl,
+                priority=Priority.TRANSLATION,
+                user_id=user_id
+            )
+        return translations
@@ -0,0 +1,64 @@
+import logging
+from collections import deque
+from typing import Any, Awaitable
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates from different chats concurrently and updates from one chat one at a time.
+
+    The first update from a chat is handled right away and its task then drains the
+    chat's FIFO of updates that arrived meanwhile. Queued updates return at once, so
+    they do not hold one of the ``max_concurrent_updates`` slots while they wait: a
+    chat sending many messages during a long reply occupies a single slot. Updates
+    without a chat or user run without waiting.
+    """
+
+    __slots__ = ("_chats",)
+
+    def __init__(self, max_concurrent_updates: int = 256):
+        super().__init__(max_concurrent_updates)
+        self._chats = {}
+
+    @staticmethod
+    def _key(update: object):
+        if not isinstance(update, Update):
+            return None
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        if update.effective_user is not None:
+            return ("user", update.effective_user.id)
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self._key(update)
+        if key is None:
+            await coroutine
+            return
+        pending = self._chats.get(key)
+        if pending is not None:
+            pending.append(coroutine)
+            return
+        pending = self._chats[key] = deque([coroutine])
+        try:
+            while pending:
+                try:
+                    await pending[0]
+                except Exception as e:
+                    logger.error(f"Помилка при обробці оновлення з чату {key}: {e}")
+                pending.popleft()
+        finally:
+            del self._chats[key]
+            # Only left over when the draining task is cancelled, e.g. on shutdown
+            for coroutine in pending:
+                coroutine.close()
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -1,68 +1,153 @@
 import os
+import time
+from typing import AsyncIterator, Union
+
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
-from telegram.constants import ParseMode
-from telegram import (Update, BotCommand, BotCommandScopeChat, MenuButtonCommands, InlineKeyboardButton,
-                      InlineKeyboardMarkup)
+
+from file_cache import FileIdCache
+from keyboards import build_buttons
+from resources import ResourceRegistry
+from splitter import MARKUP_RESERVE, MarkdownBalancer, StreamSplitter, split_text
+from telegram.constants import MessageLimit, ParseMode
+from telegram import Update, InlineKeyboardMarkup
+
+RESOURCES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources')
+
+# The cache file is set from the Config by handlers.setup(); until then file_ids are kept in memory only
+file_id_cache = FileIdCache(None, RESOURCES_DIR)
+resources = ResourceRegistry(RESOURCES_DIR)
 
 
 def load_message(name: str) -> str:
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    message_path = os.path.join(current_dir, 'resources', 'messages', f'{name}.txt')
-    with open(message_path, "r", encoding="utf-8") as file:
-        return file.read()
+    return resources.get("messages", name)
 
 
 async def send_text(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str):
     text = text.encode('utf8').decode('utf8')
-    return await context.bot.send_message(
-        chat_id=update.effective_chat.id,
-        text=text,
-        parse_mode=ParseMode.MARKDOWN
-    )
+    balancer = MarkdownBalancer()
+    message = None
+    pieces = split_text(text)
+    for index, piece in enumerate(pieces):
+        message = await _deliver(context, update.effective_chat.id, None,
+                                 balancer.render(piece, final=index == len(pieces) - 1), piece,
+                                 parse_mode=ParseMode.MARKDOWN)
+    return message
 
 
 async def send_image(update: Update, context: ContextTypes.DEFAULT_TYPE, name: str):
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    image_path = os.path.join(current_dir, 'resources', 'images', f'{name}.jpg')
+    image_path = os.path.join(RESOURCES_DIR, 'images', f'{name}.jpg')
+    cache_key = file_id_cache.key_for(image_path)
+    file_id = file_id_cache.get(cache_key)
+    if file_id:
+        try:
+            return await context.bot.send_photo(
+                chat_id=update.effective_chat.id,
+                photo=file_id
+            )
+        except BadRequest:
+            # file_id is no longer valid (e.g. a different bot token), upload the file again
+            file_id_cache.invalidate(cache_key)
     with open(image_path, 'rb') as image:
-        return await context.bot.send_photo(
+        message = await context.bot.send_photo(
             chat_id=update.effective_chat.id,
             photo=image
         )
+    file_id_cache.set(cache_key, message.photo[-1].file_id)
+    return message
 
 
-async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, commands: dict):
-    command_list = [
-        BotCommand(command=key, description=value)
-        for key, value in commands.items()
-    ]
-    await context.bot.set_my_commands(
-        command_list,
-        scope=BotCommandScopeChat(chat_id=update.effective_chat.id)
-    )
-    await context.bot.set_chat_menu_button(
-        menu_button=MenuButtonCommands(),
-        chat_id=update.effective_chat.id
-    )
-
-
-def load_prompt(name: str):
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    prompt_path = os.path.join(current_dir, 'resources', 'prompts', f'{name}.txt')
-    with open(prompt_path, "r", encoding="utf-8") as file:
-        return file.read()
+def load_prompt(name: str) -> str:
+    return resources.get("prompts", name)
 
 
-async def send_text_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, buttons: dict):
+async def send_text_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str,
+                            buttons: Union[dict, InlineKeyboardMarkup]):
     text = text.encode('utf8', errors='surrogatepass').decode('utf8')
-    keyboard = []
-    for key, value in buttons.items():
-        button = InlineKeyboardButton(str(value), callback_data=str(key))
-        keyboard.append([button])
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    reply_markup = buttons if isinstance(buttons, InlineKeyboardMarkup) else build_buttons(buttons)
     return await context.bot.send_message(
         chat_id=update.effective_message.chat_id,
         text=text,
         reply_markup=reply_markup,
         message_thread_id=update.effective_message.message_thread_id
-    )
\ No newline at end of file
+    )
+
+
+async def _deliver(context: ContextTypes.DEFAULT_TYPE, chat_id, message, text: str, plain_text: str,
+                   reply_markup: InlineKeyboardMarkup = None, parse_mode: str = None):
+    """Send ``text`` as a new message, or as the final edit of ``message``.
+
+    Falls back to ``plain_text`` without a parse mode when Telegram rejects the markup.
+    """
+    try:
+        if message is None:
+            return await context.bot.send_message(
+                chat_id=chat_id,
+                text=text,
+                reply_markup=reply_markup,
+                parse_mode=parse_mode
+            )
+        return await context.bot.edit_message_text(
+            chat_id=chat_id,
+            message_id=message.message_id,
+            text=text,
+            reply_markup=reply_markup,
+            parse_mode=parse_mode
+        )
+    except BadRequest as e:
+        if "not modified" in str(e).lower():
+            return message
+        if parse_mode is None:
+            raise
+        # The model produced Markdown Telegram cannot parse; fall back to plain text
+        return await _deliver(context, chat_id, message, plain_text, plain_text, reply_markup)
+
+
+async def send_streamed_text(update: Update, context: ContextTypes.DEFAULT_TYPE, chunks: AsyncIterator[str],
+                             prefix: str = "", suffix: str = "", reply_markup: InlineKeyboardMarkup = None,
+                             parse_mode: str = None, edit_interval: float = 1.0):
+    """Send a reply as soon as the first chunk arrives and keep editing it while the rest streams in.
+
+    Edits are coalesced to at most one per ``edit_interval`` seconds. Intermediate edits are sent as
+    plain text because half-streamed Markdown is usually unbalanced; the final edit applies
+    ``parse_mode`` and ``reply_markup``. Text longer than one Telegram message is split on
+    paragraph, sentence or code block boundaries, and each finished piece is finalised while the
+    next one is still streaming. ``prefix`` goes on the first message, ``suffix`` and ``reply_markup``
+    on the last.
+    """
+    chat_id = update.effective_chat.id
+    splitter = StreamSplitter(MessageLimit.MAX_TEXT_LENGTH - MARKUP_RESERVE - len(prefix) - len(suffix))
+    balancer = MarkdownBalancer() if parse_mode == ParseMode.MARKDOWN else None
+    message = None
+    head = prefix
+    shown_text = ""
+    last_edit = 0.0
+    async for chunk in chunks:
+        for piece in splitter.feed(chunk):
+            piece = head + piece
+            await _deliver(context, chat_id, message, balancer.render(piece) if balancer else piece, piece,
+                           parse_mode=parse_mode)
+            message, head, shown_text = None, "", ""
+        text = splitter.buffer
+        if not text.strip():
+            continue
+        now = time.monotonic()
+        if message is None:
+            message = await context.bot.send_message(chat_id=chat_id, text=head + text)
+            shown_text, last_edit = text, now
+        elif now - last_edit >= edit_interval and text.rstrip() != shown_text.rstrip():
+            # Telegram trims trailing whitespace, so a delta of only blank lines would not change the message
+            try:
+                await context.bot.edit_message_text(chat_id=chat_id, message_id=message.message_id,
+                                                    text=head + text)
+            except BadRequest as e:
+                if "not modified" not in str(e).lower():
+                    raise
+            shown_text, last_edit = text, now
+
+    text = splitter.buffer
+    if message is not None and text == shown_text and not suffix and reply_markup is None and parse_mode is None:
+        return message
+    final_text = f"{head}{text}{suffix}"
+    rendered = balancer.render(final_text, final=True) if balancer else final_text
+    return await _deliver(context, chat_id, message, rendered, final_text, reply_markup, parse_mode)
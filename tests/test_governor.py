@@ -0,0 +1,37 @@
+import asyncio
+
+from governor import RequestGovernor
+
+
+def test_release_skips_waiter_cancelled_in_the_same_tick():
+    async def scenario():
+        governor = RequestGovernor(max_in_flight=1)
+        release = asyncio.Event()
+
+        async def holder():
+            async with governor.slot():
+                await release.wait()
+            return "answer"
+
+        async def queued():
+            async with governor.slot():
+                pass
+
+        first = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        second = asyncio.create_task(queued())
+        await asyncio.sleep(0)
+        assert governor.queue_depth == 1
+
+        # The slot is freed and the queued request cancelled before either task runs again
+        release.set()
+        second.cancel()
+        assert await first == "answer"
+        await asyncio.gather(second, return_exceptions=True)
+        assert governor.in_flight == 0
+        assert governor.queue_depth == 0
+
+        async with governor.slot():
+            assert governor.in_flight == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,18 @@
+from splitter import MarkdownBalancer, split_text
+
+
+def render_all(text: str, limit: int) -> list:
+    balancer = MarkdownBalancer()
+    pieces = split_text(text, limit)
+    return [balancer.render(piece, final=index == len(pieces) - 1) for index, piece in enumerate(pieces)]
+
+
+def test_stray_markers_in_the_final_piece_are_escaped():
+    assert render_all("5 * 3 = 15 and load_prompt() now", 100) == ["5 \\* 3 = 15 and load\\_prompt() now"]
+
+
+def test_entity_cut_by_a_split_is_closed_and_reopened():
+    pieces = render_all("*" + "word " * 30 + "end*", 60)
+    assert len(pieces) > 1
+    assert all(piece.startswith("*") and piece.endswith("*") for piece in pieces)
+    assert "\\" not in "".join(pieces)
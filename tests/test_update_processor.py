@@ -0,0 +1,33 @@
+import asyncio
+from datetime import datetime
+
+from telegram import Chat, Message, Update
+
+from update_processor import PerChatUpdateProcessor
+
+
+def make_update(update_id: int, chat_id: int) -> Update:
+    return Update(update_id, message=Message(update_id, datetime.now(), Chat(chat_id, "private"), text="x"))
+
+
+def test_chat_updates_run_in_order_without_holding_slots():
+    async def scenario():
+        processor = PerChatUpdateProcessor(max_concurrent_updates=2)
+        started = []
+
+        async def handle(tag):
+            started.append(tag)
+            await asyncio.sleep(0.01)
+
+        chats = [1, 1, 1, 1, 2]
+        await asyncio.gather(*(
+            processor.process_update(make_update(index, chat), handle((chat, index)))
+            for index, chat in enumerate(chats)
+        ))
+        # The other chat got a slot although four updates from chat 1 were pending
+        assert started[:2] == [(1, 0), (2, 4)]
+        while processor.current_concurrent_updates:
+            await asyncio.sleep(0.01)
+        assert [tag for tag in started if tag[0] == 1] == [(1, 0), (1, 1), (1, 2), (1, 3)]
+
+    asyncio.run(scenario())